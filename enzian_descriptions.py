@@ -1,4 +1,4 @@
-from sequence_generation import Node, Input, Output, Constraint, Wire, PowerState, Stateful_Node, intersect, State_Space_Error, unite_dict, state_union, SET, empty_intersection
+from sequence_generation import Node, Input, Output, Constraint, Wire, PowerState, Stateful_Node, intersect, State_Space_Error, unite_dict, state_union, SET, empty_intersection, component_log
 import math
 from functools import partial
 import z3
@@ -43,6 +43,7 @@ class INA226(Node):
             ]
 
 class MAX15301(Node):
+    durations = {"*" : (0.002, 0.010)} #PMBus write of VOUT_COMMAND, soft-start ramp
     implicit_off = {"EN": [{0}], "V_PWR": [(0, 4400)]}
     implicit_on = {"EN": [{1}], "V_PWR": [(5500, 14000)]}
     BUS = Input([{0, 1}], "bus")
@@ -61,6 +62,16 @@ class MAX15301(Node):
         self.current = [(default, default)]
         self.V_OUT = MAX15301.V_OUT(default)
         super(MAX15301, self).__init__(name, bus_addr, MAX15301)
+        self.configured = False
+
+    def configure(self):
+        if self.configured:
+            return []
+        else:
+            self.configured = True
+            return [
+                "init_device('%s', False)" % (self.device)
+            ]
 
     def bus_req(self):
         return {self.V_PWR.name: [(5500, 14000)]}
@@ -91,6 +102,7 @@ class MAX15301(Node):
 
 
 class NCP(Node):
+    durations = {"*" : (0.0, 0.005)} #ramp of the output
     implicit_on = {"VRI" : [(868, 3600)], "VCC" : [(2375, 5500)]}
     implicit_off = {"VRI" : [(0, 868)], "VCC" : [(0, 2374)]}
     VCC = Input([(0, 6000)], "power")
@@ -105,6 +117,7 @@ class NCP(Node):
 
 
 class MAX8869(Node):
+    durations = {"*" : (0.0, 0.005)} #ramp of the output
     implicit_on = lambda _, thresh: {"V_IN" : [(max(thresh + 500, 2700), 5500)], "SHDN" : [{1}]}
     implicit_off = lambda _, thresh: {"V_IN" : [(0, max(thresh + 499, 2699))], "SHDN" : [{0}]}
     V_IN = Input([(0, 6000)], "power")
@@ -122,6 +135,7 @@ class MAX8869(Node):
 
 
 class MAX15053(Node):
+    durations = {"*" : (0.0, 0.005)} #ramp of the output
     implicit_on = lambda _, threshold: {"V_IN" : [(max(int(threshold * 1.06), 2700), 5500)], "V_EN" : [{1}]}
     implicit_off = lambda _, threshold: {"V_IN" : [(0, (max(int(threshold * 1.06) - 1, 2699)))], "V_EN" : [{0}]}
     V_IN = Input([(0, 6000)], "power")
@@ -164,6 +178,7 @@ def isl_outputs():
         
 
 class ISL(Node):
+    durations = {"*" : (0.0, 0.005)} #ramp of the output
     implicit_off = {"VCC" : [(0, 4300)], "EN_PWR" : [{0, 1}], "EN_VTT" : [(0, 830)]}
     VCC = Input([(0, 6000)], "power")
     EN_PWR = Input([{0, 1}], "logical") 
@@ -185,6 +200,7 @@ class ISL(Node):
 
 
 class IR(Node):
+    durations = {"*" : (0.002, 0.010)} #PMBus write of VOUT_COMMAND, soft-start ramp
     implicit_off = lambda _, thresh : {"VCC" : [(0, 2500)], "VIN" : [(0, thresh-1)], "EN" : [{0}]}
     implicit_off_2 = lambda _, thresh : {"VCC" : [(0, 2500)], "VIN" : [(0, thresh-1)], "EN_2" : [{0}]}
     device = "ir3581"
@@ -623,7 +639,7 @@ class Bus(Node):
         req = {}
         for node, _ in inputs:
             unite_dict(req, node.bus_req())
-        print(req)
+        component_log.debug("%s: requirements %s", self.name, req)
         return req
 
     def construct_req_off(self, inputs):
@@ -635,7 +651,7 @@ class Bus(Node):
                     req[wire] = state
                 else:
                     req[wire] = state_union(state, req[wire])
-        print(req)
+        component_log.debug("%s: requirements to turn off %s", self.name, req)
         return req
 
 
@@ -651,6 +667,7 @@ class Bus(Node):
 
 
 class MAX20751(Node):
+    durations = {"*" : (0.002, 0.010)} #PMBus write of VOUT_COMMAND, soft-start ramp
     implicit_on = {"VR_ON": [{1}], "VDD33":[(2970, 3630)], "VDDH":[(8500, 14000)]}
     implicit_off = {"VR_ON": [{0}], "VDD33": [0, 2800], "VDDH": [(0, 8499)]}
     VDD33 = Input([(0, 4000)], "power")
@@ -703,6 +720,7 @@ class MAX20751(Node):
 
 
 class Oscillator(Node):
+    durations = {"*" : (0.0, 0.010)} #start-up time
     VDD = Input([(0, 3600)], "power")
     CLK = Output([(0, 0), (3300, 3300), (0, 50)], [
         Constraint([(0, 0), (3300, 3300), (50, 50)], {"VDD": [(2600, 3600)]}, partial(Constraint.implicit, "CLK", {"VDD": [(2600, 3600)]})),
@@ -712,6 +730,7 @@ class Oscillator(Node):
         super(Oscillator, self).__init__(name, bus_addr, Oscillator)
 
 class SI5395(Node):
+    durations = {"*" : (0.002, 0.100)} #configuration, PLL lock
     implicit_on = {"VDD": [(2600, 3600)], "CLK_IN": [(0, 0), (3300, 3300), (50, 50)]}
     implicit_off = {"VDD": [(0, 2599)], "CLK_IN": [(0, 0), (3300, 3300), (0, 0)]}
     VDD = Input([(0, 3600)], "power")
@@ -783,6 +802,7 @@ class CPU2(Stateful_Node):
 
     
 class BMC(Node):
+    durations = {"*" : (0.001, 0.0), "B_PSUP_ON" : (0.100, 0.0), "C_PLL_DC_OK" : (0.100, 0.0), "B_CLOCK_FLOL" : (0.100, 0.0)} #GPIO writes, fan control initialisation, waits for clock lock
     B_CLOCK_FLOL = Output([{0, 1}], [Constraint([{0, 1}], {}, partial(Constraint.explicit, "B_CLOCK_FLOL", set(), set()))], "logical", Wire.fpga_clk_ok)
     B_PSUP_ON = Output([{0, 1}], [Constraint([{0, 1}], {}, partial(Constraint.explicit, "B_PSUP_ON", set(), set()))], "logical", Wire.gpio_set)
     C_RESET_N = Output([{0, 1}], [Constraint([{0, 1}], {}, partial(Constraint.explicit, "C_RESET_N", set(), set()))], "logical", Wire.gpio_set)
@@ -836,6 +856,7 @@ class CPU_3(Stateful_Node):
 
 
 class PSU(Node):
+    durations = {"*" : (0.0, 0.050)} #ramp of the supply
     EN = Input([{0, 1}], "logical")
     OUT = Output([(0, 12000)], [
         Constraint([(12000, 12000)], {"EN" : [{1}]}, partial(Constraint.implicit, "OUT", {"EN": [{1}]})),
@@ -846,6 +867,7 @@ class PSU(Node):
 
 
 class Main_PSU(Node):
+    durations = {"*" : (0.0, 0.050)} #ramp of the supplies
     EN = Input([{0, 1}], "logical")
     V33_PSU = Output([(0, 3300)], [
         Constraint([(3300, 3300)], {"EN": [{1}]}, partial(Constraint.implicit, "V33_PSU", {"EN": [{1}]})),
@@ -878,6 +900,7 @@ class PowerSupply(Node):
 
 
 class ISPPAC(Node):
+    durations = {"*" : (0.002, 0.0)} #PMBus write of the device control
     implicit_off = {"VCC": [(0, 2600)], "VCC_IN": [(0, 2000)]}
     VMON1_ATT = Input([(0, 13900)], "monitor", lambda node, name: node.isppac_monitor("VMON1_ATT", name, 0.4125))
     VMON2_ATT = Input([(0, 5734)], "monitor", lambda node, name: node.isppac_monitor("VMON2_ATT", name))
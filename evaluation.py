@@ -1,13 +1,18 @@
 #! /usr/bin/env python3
 
 import argparse
+import logging
 import random
+import sys
 import timeit
 import copy
 
-from sequence_generation import State_Search_Flags, Topology, topological_sort
+from sequence_generation import State_Search_Flags, Topology, Event_Graph
 from enzian_descriptions import enzian_nodes, enzian_wires, enzian_nodes_EVAL3
 
+#progress and results of the experiments, shown unless --log-level is above INFO
+eval_log = logging.getLogger("evaluation")
+
 problems = [
     ("p1", {"cpu" : "POWERED_ON", "fpga": "POWERED_ON"}, {"vdd_ddrcpu13" : [(1500, 1500)], "vdd_ddrcpu24" : [(1500, 1500)], "vdd_ddrfpga13" : [(1200, 1200)], "vdd_ddrfpga24" : [(1200, 1200)]}, 256),
     ("p2", {"cpu" : "POWERED_ON", "fpga": "POWERED_DOWN"}, {"vdd_ddrcpu13" : [(1500, 1500)], "vdd_ddrcpu24" : [(1500, 1500)]}, 6),
@@ -34,7 +39,7 @@ def run_eval1_m1():
         flags3 = State_Search_Flags(use_z3=True)
 
         for i in range(100):
-            print(i)
+            eval_log.info("%s: iteration %d", name, i)
             enzian.current_node_state = node_states
             random.shuffle(enzian.sorted_wires)
             for w in enzian.wires.values():
@@ -44,9 +49,7 @@ def run_eval1_m1():
             time1 = timeit.timeit(lambda: enzian.parametrized_state_search({}, flags1, 1), number = 1)
             time2 = timeit.timeit(lambda: enzian.parametrized_state_search({}, flags2, 1), number = 3) / 3
             time3 = timeit.timeit(lambda: enzian.parametrized_state_search({}, flags3, 1), number = 3) / 3
-            print(time1)
-            print(time2)
-            print(time3)
+            eval_log.info("%s: %f %f %f", name, time1, time2, time3)
             result_file.write(str(time1) + "," + str(time2) + "," + str(time3) + "\n")
 
 def run_eval1_m2():
@@ -56,13 +59,13 @@ def run_eval1_m2():
         result_file = open("results/eval1_m2_%s.csv"%name, 'a')
         flags = State_Search_Flags(all_solutions=False)
         for i in range(500):
-            print(i)
+            eval_log.info("%s: iteration %d", name, i)
             enzian.current_node_state = node_states
             random.shuffle(enzian.sorted_wires)
             for w in enzian.wires.values():
                 random.shuffle(w.constraints)
             time = timeit.timeit(lambda: enzian.parametrized_state_search({}, flags, 1), number = 3) / 3
-            print(time)
+            eval_log.info("%s: %f", name, time)
             result_file.write(str(time) + "\n")
 
 def run_eval1_m3():
@@ -71,13 +74,13 @@ def run_eval1_m3():
         result_file = open("results/eval1_m3_%s.csv"%name, 'a')
         flags = State_Search_Flags(all_solutions=True)
         for i in range(500):
-            print(i)
+            eval_log.info("%s: iteration %d", name, i)
             enzian.current_node_state = node_states
             random.shuffle(enzian.sorted_wires)
             for w in enzian.wires.values():
                 random.shuffle(w.constraints)
             time = timeit.timeit(lambda: enzian.parametrized_state_search(state_dict, flags, number), number = 3) / 3
-            print(time)
+            eval_log.info("%s: %f", name, time)
             result_file.write(str(time) + "\n")
 
 def run_eval1_m4():
@@ -86,15 +89,14 @@ def run_eval1_m4():
         result_file = open("results/eval1_m4_%s.csv"%name, 'a')
         flags = State_Search_Flags(all_solutions=False)
         for i in range(500):
-            print(i)
+            eval_log.info("%s: iteration %d", name, i)
             enzian.current_node_state = node_states
             random.shuffle(enzian.sorted_wires)
             for w in enzian.wires.values():
                 random.shuffle(w.constraints)
             time1 = timeit.timeit(lambda: enzian.parametrized_state_search({}, flags, 1), number = 3) / 3
             time2 = timeit.timeit(lambda: enzian.parametrized_state_search(state_dict, flags, 1), number = 3) / 3
-            print(time1)
-            print(time2)
+            eval_log.info("%s: %f %f", name, time1, time2)
             result_file.write(str(time1) + "," + str(time2) + "\n")
 
 
@@ -107,10 +109,9 @@ def run_eval2():
             enzian = Topology(enzian_nodes, enzian_wires)
             enzian.current_node_state = copy.deepcopy(initial)
             time = timeit.timeit(lambda: enzian.stateful_node_update(end, flags = State_Search_Flags(all_solutions=False, visualize=False)), number = 1) + time
-            print(initial)
-            print(end)
+            eval_log.info("%s: %s -> %s", problem, initial, end)
         time = time / 3
-        print(time)
+        eval_log.info("%s: %f", problem, time)
         result_file.write(problem + "," + str(time) + "\n")
 
 def run_eval3():
@@ -141,9 +142,9 @@ def run_eval3():
             if w[:4] == "set_":
                 name = w[4:]
             if not name in enzian.wires:
-                print("%s not in wires" % name)
+                eval_log.warning("%s not in wires", name)
     #assert that G is acyclic
-    print("G is acyclic: %s"% str(not topological_sort(graph) is None))
+    eval_log.info("G is acyclic: %s", str(Event_Graph.from_dict(graph, ids = enzian.event_ids).is_acyclic()))
 
     result_file = open("results/eval3.txt", 'w')
 
@@ -152,13 +153,9 @@ def run_eval3():
         graph_file = open("results/eval3_G%s.txt"%str(i), 'r')
         graph2 = eval(graph_file.read())
         graph_file.close()
-        for (c, conductors) in graph.items():
-            if c in graph2:
-                graph2[c].union(conductors)
-            else:
-                graph2[c] = conductors
-        string = "Union of G%s and G is acyclic : %s" %(str(i), str(not topological_sort(graph2) is None))
-        print(string)
+        #the edges of both graphs are combined while constructing the event graph
+        string = "Union of G%s and G is acyclic : %s" %(str(i), str(Event_Graph.from_dict(graph, graph2, ids = enzian.event_ids).is_acyclic()))
+        eval_log.info("%s", string)
         result_file.write(string + "\n")
 
     result_file.close()
@@ -193,7 +190,13 @@ if __name__ == "__main__":
         help="Run evaluation 2"
     )
 
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO",
+        help="Messages to print, INFO shows the progress and measured times of the experiments"
+    )
+
     args = parser.parse_args()
+    logging.basicConfig(stream=sys.stdout, format="%(message)s")
+    eval_log.setLevel(getattr(logging, args.log_level))
     if args.experiments is None:
         es = experiments.keys()
     else:
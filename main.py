@@ -1,26 +1,86 @@
 #! /usr/bin/env python3
 import argparse
+import logging
 
-from sequence_generation import Topology, State_Search_Flags
+from sequence_generation import Topology, State_Search_Flags, Transition_Table, Trace_Buffer, compile_transitions, Feasibility_Cache, set_log_level
 
-def enzian_sequence_gen(outfile):
+def enzian_sequence_gen(outfile, transitions = None, trace = None, timing = False, concurrent = False, feasibility_cache = None):
     from enzian_descriptions import enzian_nodes, enzian_wires
-    enzian = Topology(enzian_nodes, enzian_wires)
-    enzian.stateful_node_update({"cpu": "POWERED_ON", "fpga": "POWERED_ON"}, flags=State_Search_Flags(all_solutions=False))
-    enzian.done(outfile)
+    with Topology(enzian_nodes, enzian_wires, feasibility_cache=feasibility_cache) as enzian:
+        enzian.transition_table = transitions
+        enzian.trace = trace
+        enzian.stateful_node_update({"cpu": "POWERED_ON", "fpga": "POWERED_ON"}, flags=State_Search_Flags(all_solutions=False, concurrent_emission=concurrent, timing=timing))
+        enzian.done(outfile)
+    if timing:
+        print("predicted boot time: %.3f s" % enzian.boot_time())
+        for analysis in enzian.timings:
+            if analysis.critical_path:
+                print("%.3f s: %s" % (analysis.boot_time, " -> ".join(analysis.critical_path)))
+
+def enzian_transitions():
+    from enzian_descriptions import enzian_nodes, enzian_wires
+    return compile_transitions(enzian_nodes, enzian_wires, State_Search_Flags(all_solutions=False))
 
 platforms = {
     "enzian": enzian_sequence_gen
 }
 
+compilers = {
+    "enzian": enzian_transitions
+}
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generates power up sequences from declarative platform descriptions")
     parser.add_argument("platform", choices=["enzian"],
         help="Platform for which to generate the sequence. Currently only Enzian is supported."
     )
-    parser.add_argument("--out", "-o", type=str, required=True, metavar="FILE",
+    parser.add_argument("--out", "-o", type=str, metavar="FILE",
         help="File to which the sequence is saved"
     )
+    parser.add_argument("--feasibility-cache", type=str, metavar="FILE",
+        help="JSON file that keeps the results of consumer feasibility checks between runs (not used by --compile)"
+    )
+    parser.add_argument("--transitions", type=str, metavar="FILE",
+        help="JSON file with precomputed consumer transitions, transitions it does not contain are solved"
+    )
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="WARNING",
+        help="Messages to print, INFO shows the generated commands and DEBUG the details of the search"
+    )
+    parser.add_argument("--trace", type=str, metavar="FILE",
+        help="Append a trace of the event graph construction to FILE (JSON lines)"
+    )
+    parser.add_argument("--timing", action="store_true",
+        help="Print the predicted boot time and the critical path of every update sequence"
+    )
+    parser.add_argument("--concurrent", action="store_true",
+        help="Emit the waits of independent events as blocks that run concurrently"
+    )
+    parser.add_argument("--compile", action="store_true",
+        help="Solve all consumer transitions of the platform (one hop from the states the initial platform state reaches) and save them to the file given by --transitions instead of generating a sequence"
+    )
     args = parser.parse_args()
+    if args.compile and not args.transitions:
+        parser.error("--compile requires --transitions")
+    if not args.compile and not args.out:
+        parser.error("the following arguments are required: --out/-o")
 
-    platforms[args.platform](args.out)
+    set_log_level(getattr(logging, args.log_level))
+    feasibility_cache = None
+    if args.feasibility_cache:
+        feasibility_cache = Feasibility_Cache()
+        feasibility_cache.load(args.feasibility_cache)
+    if args.compile:
+        compilers[args.platform]().save(args.transitions)
+    else:
+        transitions = None
+        if args.transitions:
+            transitions = Transition_Table()
+            transitions.load(args.transitions)
+        trace = None
+        if args.trace:
+            trace = Trace_Buffer(path=args.trace)
+        platforms[args.platform](args.out, transitions, trace, args.timing, args.concurrent, feasibility_cache)
+        if not trace is None:
+            trace.flush()
+    if not feasibility_cache is None and not args.compile:
+        feasibility_cache.save(args.feasibility_cache)
@@ -7,9 +7,37 @@ import random
 import z3
 import subprocess
 import time
+import heapq
+import itertools
+import hashlib
+import json
+import os
+import logging
+import collections
+import types
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from enum import IntEnum, Enum
 #pylint: disable =  E0602
 
+#loggers of the subsystems, messages are only formatted if their level is enabled (see set_log_level)
+logging.getLogger("sequence_generation").addHandler(logging.NullHandler())
+search_log = logging.getLogger("sequence_generation.search")
+dp_log = logging.getLogger("sequence_generation.dp")
+sequence_log = logging.getLogger("sequence_generation.sequence")
+component_log = logging.getLogger("sequence_generation.components")
+
+def set_log_level(level, subsystems = ("search", "dp", "sequence", "components")):
+    '''sets the log level (e.g. logging.INFO to show the generated commands) of the given subsystems. Messages are written to stdout,
+    unless the application configured handlers for the "sequence_generation" logger itself'''
+    root = logging.getLogger("sequence_generation")
+    if all(isinstance(handler, logging.NullHandler) for handler in root.handlers):
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        root.addHandler(handler)
+    for subsystem in subsystems:
+        logging.getLogger("sequence_generation." + subsystem).setLevel(level)
+
 #enums used to make indexing into structures more readable/maintainable
 class SET(Enum):
     Explicit = 0
@@ -54,48 +82,108 @@ class Wire_Error(Exception):
     def __init__(self, msg):
         self.msg = msg
 
+class Canonical_Error(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+
+class Event_Graph(object):
+    '''event graph with integer event IDs, whose edges (from an event to the events that have to happen before it) are stored in CSR arrays:
+    event depends on indices[indptr[event]:indptr[event + 1]] and is a dependency of rev_indices[rev_indptr[event]:rev_indptr[event + 1]].
+    names maps the IDs to the names of the events, only the events marked in present are part of the graph.'''
+    def __init__(self, names, edges, present = None):
+        '''names: list of event names, the index of a name is the ID of its event
+
+        edges: list of pairs (event ID, ID of an event that has to happen before it)
+
+        present: list of booleans that marks the events of the graph (all events if None)'''
+        self.names = names
+        self.present = [True] * len(names) if present is None else present
+        self.indptr, self.indices = Event_Graph.csr(len(names), edges)
+        self.rev_indptr, self.rev_indices = Event_Graph.csr(len(names), [(target, source) for source, target in edges])
+
+    @staticmethod
+    def csr(n, edges):
+        '''returns the CSR arrays (indptr, indices) of the adjacency lists of n vertices given by a list of edges (source, target)'''
+        indptr = [0] * (n + 1)
+        for source, _ in edges:
+            indptr[source + 1] += 1
+        for i in range(n):
+            indptr[i + 1] += indptr[i]
+        indices = [0] * len(edges)
+        position = indptr[:-1]
+        for source, target in edges:
+            indices[position[source]] = target
+            position[source] += 1
+        return indptr, indices
+
+    @classmethod
+    def from_dict(cls, *out_going_edges_dicts, ids = None):
+        '''constructs the union of the event graphs described by dictionaries of outgoing edges (as used by topological_sort):
+
+        ids: dictionary mapping event names to IDs (e.g. Topology.event_ids), events without ID are numbered after them'''
+        ids = {} if ids is None else ids
+        names = [None] * len(ids)
+        for name, event in ids.items():
+            names[event] = name
+        present = [False] * len(names)
+        local = {}
+        def event_id(name):
+            event = ids.get(name)
+            if event is None:
+                event = local.get(name)
+                if event is None:
+                    event = len(names)
+                    local[name] = event
+                    names.append(name)
+                    present.append(False)
+            present[event] = True
+            return event
+        edges = []
+        for out_going_edges in out_going_edges_dicts:
+            for node, neighbours in out_going_edges.items():
+                source = event_id(node)
+                edges.extend((source, event_id(n)) for n in neighbours)
+        graph = cls(names, edges, present)
+        graph.ids = {**ids, **local} if local else ids
+        return graph
+
+    def rank_sort(self):
+        '''sorts the events topologically in O(V + E) (Kahn's algorithm), returns a list of lists of event IDs, whereby events in the same sublist
+        have the same "rank", i.e. can be permuted arbitrarily. Returns None if the graph contains a cycle.'''
+        remaining = [self.indptr[event + 1] - self.indptr[event] for event in range(len(self.names))]
+        rank = [event for event, present in enumerate(self.present) if present and remaining[event] == 0]
+        ranks = []
+        sorted_events = 0
+        while rank:
+            ranks.append(rank)
+            sorted_events += len(rank)
+            next_rank = []
+            for event in rank:
+                for dependent in self.rev_indices[self.rev_indptr[event]:self.rev_indptr[event + 1]]:
+                    remaining[dependent] -= 1
+                    if remaining[dependent] == 0:
+                        next_rank.append(dependent)
+            rank = next_rank
+        if sorted_events != sum(self.present):
+            return None
+        return ranks
+
+    def is_acyclic(self):
+        return not self.rank_sort() is None
+
+    def event_names(self, ranks):
+        '''translates lists of lists of event IDs (as returned by rank_sort) to the names of the events'''
+        return [[self.names[event] for event in rank] for rank in ranks]
+
+
 def topological_sort(out_going_edges_dict):
     '''topologically sorts the graph described by a dictionary of outgoing edges, returns a list of lists, 
     whereby nodes in the same sublist have the same "rank", i.e. can be permuted arbitrarily'''
-    out_going_edges = copy.deepcopy(out_going_edges_dict)
-    in_going_edges = {}
-    node_list = []
-    add_to_outgoing = set()
-    for node, neighbours in out_going_edges.items():
-        for n in neighbours:
-            size = len(neighbours)
-            if not n in in_going_edges:
-                in_going_edges.update({n: {node}})
-            else:
-                in_going_edges.update({n: in_going_edges[n] | {node}})
-            if not n in out_going_edges:
-                add_to_outgoing.add(n)
-        out_going_edges[node] = len(neighbours)
-        if not node in in_going_edges:
-            in_going_edges.update({node: set()})
-    for node in add_to_outgoing:
-        out_going_edges[node] = 0
-    value = True
-    while len(out_going_edges) != 0 and value:
-        remove_set = set()
-        for node, size in out_going_edges.items():
-            if size == 0:
-                remove_set.add(node)
-        if remove_set == set() and len(out_going_edges) != 0:
-            value = False
-        remove_list = list(remove_set)
-        #random.shuffle(remove_list)
-        node_list.append(remove_list)
-        for node in remove_list:
-            #node_list.append(node)
-            del out_going_edges[node]
-            for n in in_going_edges[node]:
-                if n in out_going_edges:
-                    out_going_edges.update({n: out_going_edges[n] - 1})
-    if not value:     
+    graph = Event_Graph.from_dict(out_going_edges_dict)
+    ranks = graph.rank_sort()
+    if ranks is None:
         return None
-    else:
-        return node_list
+    return graph.event_names(ranks)
 
 
 def select_state(state):
@@ -272,6 +360,128 @@ def intersect_option(space1, space2):
         raise State_Space_Error("incompatible state spaces: " + str(space1) + " and " + str(space2))
 
 
+def state_subset(space1, space2):
+    '''decides if the state space space1 is contained in the state space space2'''
+    try:
+        return intersect(space1, space2) == space1
+    except State_Space_Error:
+        return False
+
+
+def state_overlap(space1, space2):
+    '''decides if the state spaces space1 and space2 share a state'''
+    try:
+        intersect(space1, space2)
+        return True
+    except State_Space_Error:
+        return False
+
+
+def freeze_state(state):
+    '''returns a hashable canonical representation of a state space'''
+    if isinstance(state, list):
+        return tuple(map(freeze_state, state))
+    if isinstance(state, set):
+        return frozenset(state)
+    return state
+
+
+def canonical(obj):
+    '''returns a JSON-compatible representation of states, state dictionaries and State Possibilities that does not depend on the order of sets and dictionaries.
+    Functions (complex constraints) are represented by their code, defaults and the values they capture, partial objects by their function and arguments.
+    Raises Canonical_Error if obj contains anything else (e.g. a function capturing an object).'''
+    if isinstance(obj, dict):
+        return [[canonical(key), canonical(value)] for key, value in sorted(obj.items(), key = lambda item: str(item[0]))]
+    if isinstance(obj, (set, frozenset)):
+        return ["set", sorted(map(canonical, obj), key = json.dumps)]
+    if isinstance(obj, tuple):
+        return ["tuple"] + list(map(canonical, obj))
+    if isinstance(obj, list):
+        return list(map(canonical, obj))
+    if isinstance(obj, functools.partial):
+        return ["partial", canonical(obj.func), canonical(obj.args), canonical(obj.keywords)]
+    if isinstance(obj, types.FunctionType):
+        try:
+            closure = [cell.cell_contents for cell in obj.__closure__ or ()]
+        except ValueError:
+            raise Canonical_Error("function %s captures an unassigned variable" % obj.__qualname__)
+        return ["function", canonical_code(obj.__code__), canonical(obj.__defaults__), canonical(obj.__kwdefaults__), canonical(closure)]
+    if isinstance(obj, (types.BuiltinFunctionType, type)):
+        return ["function", repr(obj)]
+    if obj is None or isinstance(obj, (bool, int, float, str)):
+        return obj
+    raise Canonical_Error("%s has no canonical representation" % repr(obj))
+
+
+def canonical_code(code):
+    '''returns a JSON-compatible representation of a code object (including the code objects it contains)'''
+    constants = [canonical_code(const) if isinstance(const, types.CodeType) else canonical(const) for const in code.co_consts]
+    return ["code", code.co_code.hex(), constants, list(code.co_names)]
+
+
+def digest(obj):
+    '''returns a stable hash of obj (computed from its canonical representation)'''
+    return hashlib.sha256(json.dumps(canonical(obj)).encode()).hexdigest()
+
+
+def plain_data(value):
+    '''decides if value only consists of numbers, strings, booleans, None and lists, tuples, sets and dictionaries thereof'''
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return True
+    if isinstance(value, dict):
+        return all(plain_data(key) and plain_data(item) for key, item in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return all(map(plain_data, value))
+    return False
+
+
+def encode_plain(value):
+    '''returns a JSON-compatible representation of the plain data value (see plain_data), from which decode_plain restores it exactly'''
+    if isinstance(value, np.integer):
+        return int(value)
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, dict):
+        return {"dict" : [[encode_plain(key), encode_plain(item)] for key, item in value.items()]}
+    if isinstance(value, (set, frozenset)):
+        return {"frozenset" if isinstance(value, frozenset) else "set" : [encode_plain(item) for item in value]}
+    if isinstance(value, tuple):
+        return {"tuple" : [encode_plain(item) for item in value]}
+    if isinstance(value, list):
+        return [encode_plain(item) for item in value]
+    raise Canonical_Error("%s is no plain data" % repr(value))
+
+
+def decode_plain(value):
+    '''restores plain data from its representation returned by encode_plain'''
+    if isinstance(value, list):
+        return [decode_plain(item) for item in value]
+    if isinstance(value, dict):
+        (kind, items), = value.items()
+        if kind == "dict":
+            return {decode_plain(key) : decode_plain(item) for key, item in items}
+        if kind == "set":
+            return set(map(decode_plain, items))
+        if kind == "frozenset":
+            return frozenset(map(decode_plain, items))
+        if kind == "tuple":
+            return tuple(map(decode_plain, items))
+        raise Canonical_Error("unknown kind of plain data %s" % kind)
+    return value
+
+
+def is_fixed_state(state):
+    '''decides if a state space (that is not a list of State Possibilities) contains a single state'''
+    if is_possibility(state):
+        return False
+    for elem in state:
+        if isinstance(elem, set) and len(elem) != 1:
+            return False
+        if isinstance(elem, tuple) and elem[0] != elem[1]:
+            return False
+    return True
+
+
 def empty_intersection(name, state_dict1, state_dict2):
     if name[:4] == "set_":
         name = name[4:]
@@ -420,11 +630,13 @@ class Constraint(object):
     #flatten the information expressed by a Constraint to a form defined by Possibilty enum
     def create_possibility(self, output_device, most_general_state, name, updates, constraints):
         '''flattens the information expressed by a Constraint to a form defined by Possibility enum (and appends to "constraints"), adds state and dependency updates to the "update" list. Called internally in Conductor initialisation (Wire.__init__)'''
+        #the Constraint belongs to the component class and is shared by all its instances (and platforms), it must not be changed
+        dependency = self.dependency
         if not self.state_update is None:
             function = self.state_update(output_device)
             
             #determine current value of state_possibility
-            self.state_possibility = function()
+            state_possibility = function()
             
 
             #adds a new entry to update, which includes:
@@ -434,7 +646,7 @@ class Constraint(object):
             updates.append([len(constraints), Possibility.State, function, "update_%s_%d"%(name, len(constraints))])
 
         else:
-            self.state_possibility = create_state_possibility(self.state_possibility, most_general_state)
+            state_possibility = create_state_possibility(self.state_possibility, most_general_state)
             
             
         if not self.dependency_update is None:
@@ -442,9 +654,9 @@ class Constraint(object):
             (function, dependencies) = self.dependency_update
             function = function(output_device)
             updates.append([len(constraints), Possibility.Dependency, function, dependencies])
-            self.dependency = None
+            dependency = None
         
-        constraints.append([self.state_possibility, self.state_requirements, self.complex_constraints, self.dependency])
+        constraints.append([state_possibility, self.state_requirements, self.complex_constraints, dependency])
 
     def create_bus_constraints(self, output_device, input_set, name, constraints):
         constraints.append([self.state_possibility, self.state_requirements(output_device, input_set), self.complex_constraints, self.dependency(output_device, name, input_set)])
@@ -577,9 +789,7 @@ class Wire(object):
 
         _output = getattr(output_device, output_name)
         if not isinstance(_output, Output):
-            print("\ngiven output of wire " +
-                  name + " has already been assigned!\n")
-            raise AttributeError(self)
+            raise AttributeError("given output of wire %s has already been assigned!" % name)
         self.pin_name = output_name
         self.type = _output.wire_type
         self.constraints = []
@@ -595,19 +805,14 @@ class Wire(object):
         for input_node, input_name in input_set:
             _input = getattr(input_node, input_name)
             if input_node is output_device:
-                print("Warning: output of device " +
-                  input_node.name + " connected to own input")
+                component_log.warning("output of device %s connected to own input", input_node.name)
             if not (isinstance(_input, Input)):
-                print("\ngiven input or output of wire " +
-                  name + " has already been assigned!\n")
-                raise AttributeError(self)
+                raise AttributeError("given input or output of wire %s has already been assigned!" % name)
             if not (_input.wire_type == _output.wire_type):
                 if _input.wire_type == "monitor":
                     monitors.add((input_node, input_name))
                 else:
-                    print("\ninput and output given to wire " +
-                    name + " require different wire types!\n")
-                    raise AttributeError(self)
+                    raise AttributeError("input and output given to wire %s require different wire types!" % name)
             if not _input.monitor is None:
                 self.monitors.append(_input.monitor(input_node, name))
             self.most_general_state = intersect(self.most_general_state, _input.state_space)
@@ -628,18 +833,43 @@ class Wire(object):
         #instantiate wire set method
         self.set = _output.set(output_device, output_name)
 
+        #memo of possible(): maps restrictions to the State Possibilities that agree with them
+        self.possible_cache = {}
+        #State Possibilities the memo was computed from, reordering or replacing constraints invalidates it
+        self.possible_order = []
+
         #let output attribute point to wire
         setattr(output_device, output_name, self)
 
+    def possible(self, state):
+        '''returns the State Possibilities of the conductor that agree with the restriction "state", like possible(state, self.constraints).
+        Results are memoized per restriction until a State Possibility changes, the returned list may be modified by the caller.'''
+        if len(self.possible_order) != len(self.constraints) or not all(map(operator.is_, self.possible_order, self.constraints)):
+            self.possible_cache = {}
+            self.possible_order = list(self.constraints)
+        key = freeze_state(state)
+        if not key in self.possible_cache:
+            self.possible_cache[key] = possible(state, self.constraints)
+        return list(self.possible_cache[key])
+
     def update(self, topology):
         '''updates the conductor's State Possibilities according to the dependency and state update they define.
         the parameter topology is the entire Topology (Platform) object and is required to adequately update the z3 variables.'''
 
         for index, update_type, function, arg in self.updates:
             if update_type == Possibility.Dependency:
-                self.constraints[index][Possibility.Dependency] = arg[function()]
+                dependency = arg[function()]
+                if not dependency is self.constraints[index][Possibility.Dependency]:
+                    topology.updated_wires.add(self.name)
+                    self.possible_cache = {}
+                self.constraints[index][Possibility.Dependency] = dependency
             elif update_type == Possibility.State:
                 value = function()
+                if value != self.constraints[index][Possibility.State]:
+                    #learnt conflicts might rely on the previous state
+                    topology.nogoods.clear()
+                    topology.updated_wires.add(self.name)
+                    self.possible_cache = {}
                 self.constraints[index][Possibility.State] = value
                 topology.updatable_vars[arg] = topology.format_state(value)
             else:
@@ -783,6 +1013,10 @@ class Wire(object):
 
 class Node(object):
     '''base class used to describe a component, every component description must inherit from Node'''
+    #durations in seconds of the Initiate (e.g. a PMBus write) and Complete (e.g. a voltage ramp) events of the conductors the component drives:
+    #output pin name (or "*" for all other pins) -> (Initiate, Complete). Subclasses define their defaults, instances may assign their own dictionary.
+    durations = {"*" : (0.0, 0.0)}
+
     def __init__(self, name, bus_addr, node_class):
         self.name = name
         self.bus_addr = bus_addr
@@ -792,6 +1026,10 @@ class Node(object):
     def update(self, states):
         '''generic update method, can be overwritten by subclasses'''
         pass
+
+    def event_durations(self, pinname):
+        '''returns the durations (Initiate, Complete) of the events of the conductor connected to the output pin pinname'''
+        return self.durations.get(pinname, self.durations.get("*", (0.0, 0.0)))
         
 
     def get_labels(self):
@@ -907,7 +1145,25 @@ class State_Search_Flags(object):
         print_changed_req = True,
         visualize = False,
         return_graph = False,
-        prefer_concurrent_interleaving = True    
+        prefer_concurrent_interleaving = True,
+        forward_checking = False,
+        dynamic_wire_ordering = False,
+        learn_nogoods = False,
+        parallel_workers = 0,
+        split_depth = 4,
+        decompose_components = False,
+        incremental = False,
+        minimize_changes = False,
+        current_state_first = False,
+        restarts = None,
+        restart_cutoff = 200,
+        max_restarts = 10,
+        restart_seed = 0,
+        interleaving_planner = "dp",
+        feasibility_workers = 0,
+        ranking = "keep",
+        concurrent_emission = False,
+        timing = False
     ):
         self.aggressive = not all_solutions
         self.advanced_backtracking = advanced_backtracking
@@ -922,6 +1178,41 @@ class State_Search_Flags(object):
         self.visualize = visualize and global_visualise
         self.return_graph = return_graph
         self.prefer_concurrent_interleaving = prefer_concurrent_interleaving
+        #prunes the State Possibilities of undecided conductors after every choice (opt-in, it is not shown to pay off on Enzian)
+        self.forward_checking = forward_checking
+        self.dynamic_wire_ordering = dynamic_wire_ordering
+        #records the assignments that made a choice point fail and skips them later (opt-in, see Nogood_Database)
+        self.learn_nogoods = learn_nogoods
+        self.parallel_workers = parallel_workers
+        self.split_depth = split_depth
+        self.decompose_components = decompose_components
+        self.incremental = incremental
+        self.minimize_changes = minimize_changes
+        self.current_state_first = current_state_first
+        #restart strategy of searches for a single solution: None, "luby" or "geometric" cutoffs on the number of expanded nodes
+        self.restarts = restarts
+        self.restart_cutoff = restart_cutoff
+        self.max_restarts = max_restarts
+        self.restart_seed = restart_seed
+        #method used to find a feasible interleaving of consumer transitions: "dp" (entire table), "astar" (goal-directed), "bmc" (single z3 problem)
+        #or "greedy" (heuristic, falls back to "dp" if it gets stuck)
+        self.interleaving_planner = interleaving_planner
+        #number of processes checking the entries of a dp table wavefront in parallel ("dp" planner), no pool is used if <= 1
+        self.feasibility_workers = feasibility_workers
+        #ranking of the candidate solutions applied by apply_changes: name of a registered cost (e.g. "latency" for the fastest plan),
+        #list of names (lexicographic) or dictionary name -> weight (weighted sum), lower costs are better
+        self.ranking = ranking
+        #emits the waits of the events of every rank as a block of tasks that run concurrently (see run_concurrently_preamble)
+        self.concurrent_emission = concurrent_emission
+        #analyses the timing of every applied update sequence (see Topology.timings), which costs an extra rank sort per sequence
+        self.timing = timing
+
+    #flags that only change what is printed or written to files, not the solution that is found and the commands emitted for it
+    output_flags = {"print_solutions", "no_output", "print_changed_req", "visualize", "return_graph"}
+
+    def result_options(self):
+        '''returns the values of all flags that may change the solution that is found or the commands and timings recorded for it'''
+        return {name : value for name, value in vars(self).items() if not name in State_Search_Flags.output_flags}
 
 
 #used in shared_wire_states array because numpy does not support arrays of dictionaries... :|
@@ -934,15 +1225,239 @@ class Dictionary_object(object):
 
 
 
+class Feasibility_Cache(object):
+    '''results of z3 feasibility checks of combined consumer demands (see Topology.check_feasibility).
+    Entries are keyed by a fingerprint of the z3 problem of the platform and its updatable states, so a cache can be shared by several Topology instances.'''
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        self.entries = {}
+
+    def get(self, key):
+        '''returns the recorded feasibility for key, None if it is unknown'''
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def add(self, key, feasible):
+        self.entries[key] = feasible
+
+    def save(self, path):
+        '''writes the cache to the JSON file at path'''
+        with open(path, 'w') as cache_file:
+            json.dump({"entries" : self.entries}, cache_file)
+
+    def load(self, path):
+        '''adds the entries stored in the JSON file at path (if it exists)'''
+        if os.path.exists(path):
+            with open(path, 'r') as cache_file:
+                self.entries.update(json.load(cache_file)["entries"])
+
+
+class Transition_Table(object):
+    '''precomputed consumer transitions (see compile_transitions and Topology.stateful_node_update).
+    A plan is keyed by the platform, the complete virtual platform state it starts from, the requested consumer states, the search flags
+    that influence the result and the order in which the search considers conductors and State Possibilities,
+    it holds the interleaving as well as the state updates and commands of every step.'''
+    #format of the plans, files of other versions are ignored by load
+    version = 2
+
+    def __init__(self):
+        self.plans = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.plans)
+
+    def get(self, key):
+        '''returns the plan recorded for key, None if it is unknown'''
+        plan = self.plans.get(key)
+        if plan is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return plan
+
+    def add(self, key, plan):
+        self.plans[key] = plan
+
+    def save(self, path):
+        '''writes the table to the JSON file at path'''
+        with open(path, 'w') as table_file:
+            json.dump({"version" : self.version, "plans" : encode_plain(self.plans)}, table_file)
+
+    def load(self, path):
+        '''adds the plans stored in the JSON file at path (if it exists and has the format of this version)'''
+        if os.path.exists(path):
+            with open(path, 'r') as table_file:
+                try:
+                    table = json.load(table_file)
+                except ValueError:
+                    table = None
+            if not isinstance(table, dict) or table.get("version") != self.version:
+                search_log.warning("ignoring transition table %s, it was not written by this version", path)
+                return
+            self.plans.update(decode_plain(table["plans"]))
+
+
+class Trace_Buffer(object):
+    '''in-memory buffer of structured trace events (dictionaries with a "kind" entry), flush appends the buffered events to a file as JSON lines.
+    Without path, it is a ring buffer that keeps the last capacity events, otherwise it writes its events to path in batches of capacity events.'''
+    def __init__(self, capacity = 10000, path = None):
+        self.capacity = capacity
+        self.path = path
+        self.events = collections.deque(maxlen = capacity if path is None else None)
+
+    def __len__(self):
+        return len(self.events)
+
+    def record(self, kind, **data):
+        data["kind"] = kind
+        self.events.append(data)
+        if not self.path is None and len(self.events) >= self.capacity:
+            self.flush()
+
+    def flush(self, path = None):
+        '''appends the buffered events to the file at path (self.path if None)'''
+        with open(self.path if path is None else path, 'a') as trace_file:
+            for event in self.events:
+                trace_file.write(json.dumps(event) + "\n")
+        self.events.clear()
+
+
+def trace_events(event_sets):
+    '''returns a JSON-compatible copy of a dictionary mapping events to sets of events (None stands for events that already happened)'''
+    return {event : sorted(events, key = str) for event, events in event_sets.items()}
+
+
+#written at the beginning of command sequences that contain concurrent blocks (State_Search_Flags.concurrent_emission)
+run_concurrently_preamble = """from concurrent.futures import ThreadPoolExecutor
+
+def run_concurrently(*tasks):
+    with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        for future in [executor.submit(task) for task in tasks]:
+            future.result()
+
+"""
+
+
+class Timing_Analysis(object):
+    '''critical path analysis of an event graph whose events take the given durations:
+
+    start / finish: earliest start and finish time of every event
+    
+    slack: time by which every event can be delayed without delaying the end of the sequence
+
+    boot_time: predicted duration of the sequence, critical_path: chain of events (first to last) that determines boot_time'''
+    def __init__(self, graph, ranks, durations):
+        '''graph: Event_Graph, ranks: its rank_sort, durations: list of the durations of all its events'''
+        self.start = {}
+        self.finish = {}
+        self.slack = {}
+        self.boot_time = 0.0
+        self.critical_path = []
+        start = [0.0] * len(graph.names)
+        finish = [0.0] * len(graph.names)
+        order = [event for rank in ranks for event in rank]
+        for event in order:
+            dependencies = graph.indices[graph.indptr[event]:graph.indptr[event + 1]]
+            start[event] = max((finish[d] for d in dependencies), default = 0.0)
+            finish[event] = start[event] + durations[event]
+        if not order:
+            return
+        self.boot_time = max(finish[event] for event in order)
+        latest_finish = {}
+        for event in reversed(order):
+            dependents = graph.rev_indices[graph.rev_indptr[event]:graph.rev_indptr[event + 1]]
+            latest_finish[event] = min((latest_finish[d] - durations[d] for d in dependents), default = self.boot_time)
+        for event in order:
+            name = graph.names[event]
+            self.start[name] = start[event]
+            self.finish[name] = finish[event]
+            self.slack[name] = latest_finish[event] - finish[event]
+        #follow the dependencies that finish last back from the event that finishes last
+        event = max(order, key = lambda e: finish[e])
+        while not event is None:
+            self.critical_path.append(graph.names[event])
+            dependencies = graph.indices[graph.indptr[event]:graph.indptr[event + 1]]
+            event = max(dependencies, key = lambda d: finish[d], default = None)
+        self.critical_path.reverse()
+
+    def __eq__(self, other):
+        return isinstance(other, Timing_Analysis) and self.__dict__ == other.__dict__
+
+    def data(self):
+        '''returns the results of the analysis as plain data (see from_data)'''
+        return copy.deepcopy(self.__dict__)
+
+    @classmethod
+    def from_data(cls, data):
+        '''restores an analysis from the plain data returned by data'''
+        analysis = cls.__new__(cls)
+        analysis.__dict__.update(copy.deepcopy(data))
+        return analysis
+
+
+#cost functions used to rank candidate solutions: name -> (function, needs commands). function(topology, solution, commands) returns a number, lower is better;
+#solution is a candidate returned by create_update_sequence (state ranges, states, kept states, event sequence and possibly the event graph),
+#commands the list of commands it emits (None if the cost was registered without needing them)
+solution_costs = {}
+
+def register_cost(name, function, commands = False):
+    '''registers a cost function that State_Search_Flags.ranking can refer to by name, commands specifies if it needs the emitted commands'''
+    solution_costs[name] = (function, commands)
+
+
+def kept_states_cost(topology, solution, commands):
+    '''prefers solutions that keep the most conductor states (default ranking)'''
+    return -solution[2]
+
+def latency_cost(topology, solution, commands):
+    '''predicted duration of the update sequence (see Timing_Analysis)'''
+    timing = topology.analyse_timing(solution[3], solution[4] if len(solution) > 4 else None)
+    return float("inf") if timing is None else timing.boot_time
+
+def bus_transactions_cost(topology, solution, commands):
+    '''number of commands that access a bus (device initialisation, writes, controls and voltage polls)'''
+    prefixes = ("power.", "init_device(", "wait_for_voltage(")
+    return sum(1 for command in commands if command.startswith(prefixes))
+
+def set_events_cost(topology, solution, commands):
+    '''number of explicit set events'''
+    return sum(1 for rank in solution[3] for name in rank if topology.event_ids[name] & 1 == 0)
+
+def rank_depth_cost(topology, solution, commands):
+    '''number of ranks of the update sequence'''
+    return sum(1 for rank in solution[3] if rank)
+
+register_cost("keep", kept_states_cost)
+register_cost("latency", latency_cost)
+register_cost("bus_transactions", bus_transactions_cost, commands = True)
+register_cost("set_events", set_events_cost)
+register_cost("depth", rank_depth_cost)
+
+
 class Topology(object):
     '''class used to construct platform instances'''
-    def __init__(self, nodes, wires, rank_length = 1, speed = 0.5, sorted_wires = None):
+    def __init__(self, nodes, wires, rank_length = 1, speed = 0.5, sorted_wires = None, feasibility_cache = None):
         '''constructs a reduced platfrom instance from component and connection descriptions:
 
         nodes: a list of component descriptions of the following from (component_name, bus_address, component_class, <list of additional attributes>)
         whereby the component_class specifies the class of which the described component is an instance (said class must inherit from Node for a producer / Stateful_Node for a consumer)
 
-        wires: a list of connection descriptions of the following format: (conductor name, name of output component, name of output pin, Set of: (name of input component, name of input pin))'''
+        wires: a list of connection descriptions of the following format: (conductor name, name of output component, name of output pin, Set of: (name of input component, name of input pin))
+
+        feasibility_cache: Feasibility_Cache shared with other instances (e.g. loaded from a file), by default the instance uses a cache of its own'''
 
         self.commands = ""
         self.nodes = {}
@@ -954,11 +1469,39 @@ class Topology(object):
         self.current_node_state = {}
         self.speed = speed
         
+        #cache of feasibility checks (None disables it) and key of the context of the checks of the current consumer transition
+        self.feasibility_cache = Feasibility_Cache() if feasibility_cache is None else feasibility_cache
+        self.feasibility_context = None
+        #demands of the consumers that do not transition while a transition is planned (see solve_transition)
+        self.transition_context = {}
+        #process pool checking feasibility in parallel (see feasibility_pool), reused by all transitions, and its number of workers
+        self.feasibility_executor = None
+        self.feasibility_executor_workers = 0
+        #receives structured trace events if not None (e.g. a Trace_Buffer)
+        self.trace = None
+        #timing analyses of the update sequences applied by apply_changes (if flags.timing is set)
+        self.timings = []
+        #precomputed consumer transitions (None: always solve them), steps of the transition that is currently recorded
+        self.transition_table = None
+        self.recorded_steps = None
+
         #attributes storing z3 expression of problem
         self.problem = z3.Solver()
         self.vars = {}
         #stores variables corresponding to updatable state_possibilities
         self.updatable_vars = {}
+        #conflicts learnt by the state generation procedure, kept as long as the State Possibilities do not change
+        self.nogoods = Nogood_Database()
+        #consumer demands and proposed states of the last applied solution (used by the incremental mode)
+        self.incremental_support = None
+        #supports of the solutions returned by the last state generation, in the same order
+        self.solution_support = []
+        #conductors whose State Possibilities changed since incremental_support was recorded
+        self.updated_wires = set()
+        #(seed, cutoff, found solution) of the runs of the last search with restarts
+        self.restart_seeds = []
+        #False if the last interleaving was found by a heuristic that may miss more concurrent (or sequential) interleavings
+        self.last_interleaving_complete = True
         
         #used to construct dependency graph of wires
         out_going_wires = {}
@@ -1043,6 +1586,34 @@ class Topology(object):
             self.sorted_wires = list(self.wires.keys()) #topological_sort(graph)
         else:
             self.sorted_wires = sorted_wires#list(self.wires.keys())
+        self.update_wire_ranks()
+
+        #integer IDs of the events of the conductors: the Initiate event ("set_" + name) of the i-th conductor is 2 * i, its Complete event (name) 2 * i + 1
+        self.event_names = []
+        for name in self.wires:
+            self.event_names.extend(["set_" + name, name])
+        self.event_ids = {name : event for event, name in enumerate(self.event_names)}
+
+        #number of conductors each conductor shares a state requirement with, tie-breaker of the dynamic wire ordering
+        #conductors that may be coupled by a state requirement or complex constraint (interaction graph)
+        self.wire_neighbours = {name: set() for name in self.wires}
+        for wire in self.wires.values():
+            for _, condition, complex_constraints, _ in wire.constraints:
+                names = set(condition) | {name for _, variables in complex_constraints for name, _ in variables}
+                for name in names:
+                    if name != wire.name and name in self.wire_neighbours:
+                        self.wire_neighbours[wire.name].add(name)
+                        self.wire_neighbours[name].add(wire.name)
+        #conductors whose state a conductor may restrict (fan-in), complex constraints couple conductors in both directions
+        self.wire_fan_in = {name: set() for name in self.wires}
+        for wire in self.wires.values():
+            for _, condition, complex_constraints, _ in wire.constraints:
+                self.wire_fan_in[wire.name].update(name for name in condition if name != wire.name and name in self.wires)
+                for name in {name for _, variables in complex_constraints for name, _ in variables}:
+                    if name != wire.name and name in self.wires:
+                        self.wire_fan_in[wire.name].add(name)
+                        self.wire_fan_in[name].add(wire.name)
+        self.wire_degree = {name: len(n) for name, n in self.wire_neighbours.items()}
 
         #object that handles visualisation of updates
         # self.system = System(graph_nodes, graph_w)
@@ -1060,15 +1631,34 @@ class Topology(object):
         '''used to ensure that process stays alive until user has terminated interaction with visualisation
     by pressing ESCAPE'''
         commands = open(path, 'w')
+        if "run_concurrently(" in self.commands:
+            commands.write(run_concurrently_preamble)
         commands.write(self.commands)
         commands.close()
     
     #methods used to express constraints in z3
     #---------------------------------------------------------------------------------------------------
     def generate_z3_solver(self):
+        #the workers of a feasibility pool are preloaded with the previous constraints
+        self.shutdown_feasibility_pool()
         self.problem = z3.Solver()
-        for wire in self.wires.values():
-            self.problem.add(self.generate_constraints(wire))
+        #constraints of the platform, the updatable states and the demands of a transition are pushed on top of them
+        self.base_constraints = []
+        #identifies the constraints added to the z3 problem independently of the order of State Possibilities (the possibility index variables),
+        #updatable states are represented by their variable (their values are part of updatable_vars)
+        fingerprint = {}
+        #hash of the constraint of every State Possibility (by id, together with the possibility itself), identifies the order of State Possibilities
+        self.possibility_hashes = {}
+        for name, wire in self.wires.items():
+            possibilities = self.possibility_constraints(wire)
+            self.base_constraints.append(self.generate_constraints(wire, possibilities))
+            hashes = [hashlib.sha256(possibility.sexpr().encode()).hexdigest() for possibility in possibilities]
+            for possibility, possibility_hash in zip(wire.constraints, hashes):
+                self.possibility_hashes[id(possibility)] = (possibility, possibility_hash)
+            fingerprint[name] = sorted(hashes)
+        for constraints in self.base_constraints:
+            self.problem.add(constraints)
+        self.z3_fingerprint = digest(fingerprint)
         #add current updatable constraints to problem:
         self.problem.push()
         self.problem.add(self.translate_state_dict(self.updatable_vars))
@@ -1231,8 +1821,8 @@ class Topology(object):
             
 
 
-    def generate_constraints(self, wire):
-        '''translates the conductor referenced by the Wire instance "wire" to appropriate z3 constraints'''
+    def possibility_constraints(self, wire):
+        '''translates the State Possibilities of the conductor referenced by the Wire instance "wire" to z3 constraints, in the order of wire.constraints'''
         possibilities = []
         for i in range(len(wire.constraints)):
             state, conditions, complex_constraints, _ = wire.constraints[i]
@@ -1244,9 +1834,17 @@ class Topology(object):
                 state = self.format_names(self.get_names(update[0][3], state_length), state)
             new_condition = copy.deepcopy(conditions)
             new_condition[wire.name] = state
-            new_condition = self.translate_state_dict(new_condition)
-            possibilities.append(z3.And(new_condition, self.get_complex_constraint(complex_constraints), self.vars[wire.name + "_"] == i))
-        return z3.Or(*possibilities)
+            #conditions are emitted in the order of their conductors, the order of the requirement dictionaries differs between instances
+            new_condition = self.translate_state_dict(dict(sorted(new_condition.items())))
+            possibilities.append(z3.And(new_condition, self.get_complex_constraint(complex_constraints)))
+        return possibilities
+
+    def generate_constraints(self, wire, possibilities = None):
+        '''translates the conductor referenced by the Wire instance "wire" to appropriate z3 constraints:
+        one of its State Possibilities (possibility_constraints, unless given) holds, and the variable <wire>_ is its index'''
+        if possibilities is None:
+            possibilities = self.possibility_constraints(wire)
+        return z3.Or(*[z3.And(possibility, self.vars[wire.name + "_"] == i) for i, possibility in enumerate(possibilities)])
 
 
     def recover_solution(self, model):
@@ -1280,7 +1878,28 @@ class Topology(object):
 
     #can be passed to "sorted" as key
     def wire_sort_function(self, wire):
-        return self.sorted_wires.index(wire)
+        return self.wire_rank[wire]
+
+    def update_wire_ranks(self):
+        '''precomputes the position of every conductor in sorted_wires, must be called whenever sorted_wires is changed (done at the start of every search)'''
+        self.wire_rank = {wire: i for i, wire in enumerate(self.sorted_wires)}
+
+    def order_choices(self, wire, choices):
+        '''orders the State Possibilities "choices" of conductor "wire": the ones containing the conductor's current state first,
+        then by the number of other conductors whose current state they require to change (ties keep the description order)'''
+        def changes(choice):
+            state, requirements, _, _ = choice
+            keeps = wire in self.current_wire_state and state_overlap(self.current_wire_state[wire], state)
+            return (not keeps, sum(1 for name, requirement in requirements.items() if name in self.current_wire_state and not state_overlap(self.current_wire_state[name], requirement)))
+        return sorted(choices, key = changes)
+
+    def frontier_key(self, wire, state, flags):
+        '''returns the priority with which the state generation procedure enforces the restriction "state" of conductor "wire" (smaller is earlier):
+
+        by default the position of wire in sorted_wires, with flags.dynamic_wire_ordering the number of remaining State Possibilities first and the degree of the conductor second'''
+        if flags.dynamic_wire_ordering:
+            return (len(self.wires[wire].possible(state)), -self.wire_degree[wire], self.wire_rank[wire])
+        return (self.wire_rank[wire],)
     
     #constructs a dictionary containing all wires states required by the stateful nodes not in the "ignore_node" set
     def get_stateful_node_dict(self, ignore_node):
@@ -1353,8 +1972,7 @@ class Topology(object):
                     raise State_Space_Error(
                         "given state %s for %s does not conform to state space of wire" % (state, name))
             else:
-                print("no wire in topology with name " + name)
-                raise AttributeError
+                raise AttributeError("no wire in topology with name %s" % name)
         for name, state in wire_state.items():
             if name in self.current_wire_state_range:
                 try:
@@ -1365,66 +1983,365 @@ class Topology(object):
                 except State_Space_Error:
                     raise State_Space_Error("given state %s for %s does not agree with current wire range %s" % (state, name, self.current_wire_state_range[name]))
             elif not name in self.wires:
-                print("no wire in topology with name " + name)
-                raise AttributeError
+                raise AttributeError("no wire in topology with name %s" % name)
 
 
     #methodes used by stateful nodes updates (for consumer power state transitions)
     #---------------------------------------------------------------------------------------------
    
-    def check_feasibility(self, index, dp_table):
-        '''uses the z3 solver to check if entry of the dp_table specified by index is feasible:
-        
-        index: tuple of indices of length dim(dp tapble), specifies an entry of the dp table'''
+    def entry_constraints(self, index, dp_table):
+        '''returns the united consumer demands of the entry of the dp_table specified by index, None if they contradict each other'''
         constraints = {}
         for j in range(len(index)):
             try:
                 #try to unite the consumer demand dictionaries of all consumer dimensions
                 unite_dict(constraints, dp_table[j][index[j]][0])
             except State_Space_Error:
-                return False
+                return None
+        return constraints
+
+    def feasibility_key(self, constraints):
+        '''returns the key of the feasibility of constraints under the current z3 problem in self.feasibility_cache,
+        None if the problem cannot be identified (the check must not be cached)'''
+        if self.z3_fingerprint is None:
+            return None
+        try:
+            context = self.feasibility_context
+            if context is None:
+                context = digest([self.z3_fingerprint, self.updatable_vars])
+            return digest([context, constraints])
+        except Canonical_Error:
+            return None
+
+    def check_feasibility(self, index, dp_table):
+        '''uses the z3 solver to check if entry of the dp_table specified by index is feasible:
+        
+        index: tuple of indices of length dim(dp tapble), specifies an entry of the dp table'''
+        constraints = self.entry_constraints(index, dp_table)
+        if constraints is None:
+            return False
+        return self.check_constraints(constraints)
+
+    def check_constraints(self, constraints):
+        '''uses the z3 solver to check if the state dictionary constraints is feasible together with the current z3 problem'''
+        key = None
+        if not self.feasibility_cache is None:
+            key = self.feasibility_key(constraints)
+        if not key is None:
+            success = self.feasibility_cache.get(key)
+            if not success is None:
+                return success
         self.problem.push()
         self.problem.add(self.translate_state_dict(constraints))
         success = self.problem.check() == z3.sat
         self.problem.pop()
+        if not key is None:
+            self.feasibility_cache.add(key, success)
         return success
 
+    def check_feasibility_batch(self, cells, dp_table, executor, problem):
+        '''checks the feasibility of several entries of the dp_table (like check_feasibility) and returns a list of the results.
+        Entries that are not in self.feasibility_cache are checked in parallel by the processes of executor, which hold their own z3 context
+        with the constraints of the platform (see _init_feasibility_worker). problem is a pair (key, SMT-LIB text) of the rest of self.problem.'''
+        results = [False] * len(cells)
+        pending = []
+        for i, cell in enumerate(cells):
+            constraints = self.entry_constraints(cell, dp_table)
+            if constraints is None:
+                continue
+            key = None
+            if not self.feasibility_cache is None:
+                key = self.feasibility_key(constraints)
+            if not key is None:
+                success = self.feasibility_cache.get(key)
+                if not success is None:
+                    results[i] = success
+                    continue
+            #SMT-LIB text including the declarations of all variables constraints refers to
+            solver = z3.Solver()
+            solver.add(self.translate_state_dict(constraints))
+            pending.append((i, key, solver.sexpr()))
+        checks = executor.map(_check_smt, itertools.repeat(problem[0]), itertools.repeat(problem[1]), [smt for _, _, smt in pending])
+        for (i, key, _), success in zip(pending, checks):
+            results[i] = success
+            if not key is None:
+                self.feasibility_cache.add(key, success)
+        return results
+
 
     #uses z3 solver to determine feasible interleavings (using dynamic programming)
-    def determine_reachable(self, dp_table, prefer_concurrent):
-        '''uses the z3 solver to construct a reachable table that marks if a dp-table entry is reachable and if yes, from which other entry it could be reached'''
+    def determine_reachable(self, dp_table, prefer_concurrent, workers = 0):
+        '''uses the z3 solver to construct a reachable table that marks if a dp-table entry is reachable and if yes, from which other entry it could be reached.
+
+        The table is processed in anti-diagonal wavefronts (entries with the same sum of indices), whose entries only depend on earlier wavefronts.
+        An entry is reached from the lexicographically smallest feasible predecessor if prefer_concurrent is set (the largest step, i.e. the most
+        concurrent transitions), otherwise from the lexicographically largest one. Returns the predecessor table (an int array with
+        shape dimensions + (len(dimensions),), -1 for unreached entries) and the dimensions.
+
+        If workers > 1, the entries of a wavefront are checked in parallel by a pool of as many processes (see feasibility_pool).'''
+        executor = self.feasibility_pool(workers)
+        if not executor is None:
+            #the workers hold the constraints of the platform, the rest of the current problem is sent along with the entries
+            delta = z3.Solver()
+            delta.add(self.translate_state_dict(self.updatable_vars))
+            delta.add(self.translate_state_dict(self.transition_context))
+            problem = delta.sexpr()
+            problem_key = hashlib.sha256(problem.encode()).hexdigest()
+            return self.determine_reachable_with(dp_table, prefer_concurrent, lambda cells: self.check_feasibility_batch(cells, dp_table, executor, (problem_key, problem)))
+        return self.determine_reachable_with(dp_table, prefer_concurrent, lambda cells: [self.check_feasibility(cell, dp_table) for cell in cells])
+
+    def feasibility_pool(self, workers):
+        '''returns the process pool with the given number of workers that checks the feasibility of dp table entries, None if workers <= 1 (or processes
+        cannot be forked). The pool is started once and reused by later transitions, its workers are preloaded with the constraints of the platform
+        (generate_z3_solver stops it). The pool is stopped by shutdown_feasibility_pool, e.g. at the end of a with statement on the Topology.'''
+        if workers <= 1 or not "fork" in multiprocessing.get_all_start_methods():
+            return None
+        if not self.feasibility_executor is None and self.feasibility_executor_workers != workers:
+            self.shutdown_feasibility_pool()
+        if self.feasibility_executor is None:
+            base = z3.Solver()
+            for constraints in self.base_constraints:
+                base.add(constraints)
+            self.feasibility_executor = ProcessPoolExecutor(workers, mp_context = multiprocessing.get_context("fork"),
+                initializer = _init_feasibility_worker, initargs = (base.sexpr(),))
+            self.feasibility_executor_workers = workers
+        return self.feasibility_executor
+
+    def shutdown_feasibility_pool(self):
+        '''stops the processes of the pool started by feasibility_pool (if any)'''
+        if not self.feasibility_executor is None:
+            self.feasibility_executor.shutdown()
+            self.feasibility_executor = None
+            self.feasibility_executor_workers = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown_feasibility_pool()
+
+    def determine_reachable_with(self, dp_table, prefer_concurrent, check_wavefront):
+        '''determine_reachable, whereby check_wavefront returns the feasibility of a list of dp table entries'''
         dimensions = tuple(map(len, dp_table))
-        t = [(str(i), "int32") for i in range(len(dimensions))]
-        size = functools.reduce(lambda x, y: x * y, dimensions)
-        fill_value = tuple([-1 for i in range(len(dimensions))]) #tuple filled with -1 if length #nodes
-        all_zeros = [0 for i in range(len(dimensions))]
-        reachable = np.ndarray(dimensions, dtype=t, buffer = np.array([fill_value for i in range(size)]))
-        feasible = np.zeros(dimensions)
-        steps = generate_all_valid_steps(len(dimensions))
-        steps.remove(all_zeros)
-        for i in np.ndindex(dimensions):
-            #reachable entry only propagates "reachable" if its index is (0, 0, ..., 0)
-            #or if it is feasible and was reached before
-            if (sum(i) == 0 or not numpy_compare(reachable[i], fill_value)) and self.check_feasibility(i, dp_table):
-                feasible[i] = 1
-                for step in steps:
-                    #reachable propagated to all entries that are "one step away" (also diagonally over several dimensions)
-                    index = tuple(map(lambda x: x[0] + x[1], zip(step, i)))
-                    try:
-                        #REGULAR REACHABLE CONSTRUCTION:
-                        if prefer_concurrent:
-                            if numpy_compare(reachable[index], fill_value):
-                                reachable[index] = i
-                        else:
-                            #CONSTRUCTION FOR EVAL 3:
-                            reachable[index] = i
-                    except:
-                        pass
-        if numpy_compare(reachable[fill_value], fill_value): #if last element was not reached
+        d = len(dimensions)
+        reachable = np.full(dimensions + (d,), -1, dtype = np.int32)
+        #entries that are reachable and feasible, only these propagate "reachable"
+        feasible = np.zeros(dimensions, dtype = bool)
+        #steps ordered such that the first feasible predecessor found is the one the entry is reached from
+        steps = [np.array(step, dtype = np.int32) for step in itertools.product([0, 1], repeat = d) if any(step)]
+        if prefer_concurrent:
+            steps.reverse()
+        indices = np.indices(dimensions).reshape(d, -1)
+        level_of = indices.sum(axis = 0)
+        levels = sum(dimensions) - d + 1
+        #cells grouped by level once (stable, such that every wavefront keeps the order of the entries)
+        order = np.argsort(level_of, kind = "stable")
+        bounds = np.searchsorted(level_of[order], np.arange(levels + 1))
+        for level in range(levels):
+            cells = indices[:, order[bounds[level]:bounds[level + 1]]]
+            predecessors = np.full(cells.shape, -1, dtype = np.int32)
+            found = np.zeros(cells.shape[1], dtype = bool)
+            for step in steps:
+                candidates = cells - step[:, None]
+                valid = ~found & (candidates >= 0).all(axis = 0)
+                valid[valid] = feasible[tuple(candidates[:, valid])]
+                predecessors[:, valid] = candidates[:, valid]
+                found |= valid
+            if level == 0:
+                #the entry (0, 0, ..., 0) is the starting point
+                found[:] = True
+            reachable[tuple(cells)] = predecessors.T
+            wavefront = [tuple(int(i) for i in cell) for cell in cells[:, found].T]
+            dp_log.debug("wavefront %d: %d reached entries", level, len(wavefront))
+            for cell, success in zip(wavefront, check_wavefront(wavefront)):
+                if success:
+                    feasible[cell] = True
+        last = tuple(n - 1 for n in dimensions)
+        if reachable[last][0] == -1: #if last element was not reached
             raise Synthesis_Error("no feasible solution")
-        print(reachable)
         return reachable, dimensions
 
+    def astar_interleaving(self, dp_table, prefer_concurrent):
+        '''goal-directed alternative to determine_reachable and extract_solution: explores the dp table best-first from (0, 0, ..., 0) and returns
+        a feasible path to the last entry. Feasibility is only checked for entries taken from the frontier, the search stops at the last entry.
+
+        With prefer_concurrent every step costs 1, such that paths with the fewest (most concurrent) steps are found (Chebyshev distance heuristic),
+        otherwise a step advancing k consumers costs 2k - 1, such that consumers transition one after another where possible (Manhattan distance heuristic).'''
+        dimensions = tuple(map(len, dp_table))
+        d = len(dimensions)
+        last = tuple(n - 1 for n in dimensions)
+        steps = [step for step in itertools.product([0, 1], repeat = d) if any(step)]
+        if prefer_concurrent:
+            cost = lambda step: 1
+            heuristic = lambda cell: max(l - c for l, c in zip(last, cell))
+        else:
+            cost = lambda step: 2 * sum(step) - 1
+            heuristic = lambda cell: sum(last) - sum(cell)
+        start = tuple(0 for _ in range(d))
+        parent = {start : None}
+        distance = {start : 0}
+        frontier = [(heuristic(start), 0, start)]
+        closed = set()
+        while frontier:
+            _, g, cell = heapq.heappop(frontier)
+            g = -g
+            if cell in closed:
+                continue
+            closed.add(cell)
+            if cell == last:
+                sequence = []
+                while not cell is None:
+                    sequence.append(cell)
+                    cell = parent[cell]
+                list.reverse(sequence)
+                return sequence
+            if not self.check_feasibility(cell, dp_table):
+                continue
+            for step in steps:
+                successor = tuple(c + s for c, s in zip(cell, step))
+                if any(c > l for c, l in zip(successor, last)):
+                    continue
+                new_distance = g + cost(step)
+                if new_distance < distance.get(successor, new_distance + 1):
+                    distance[successor] = new_distance
+                    parent[successor] = cell
+                    #among equally promising entries, prefer the ones further along
+                    heapq.heappush(frontier, (new_distance + heuristic(successor), -new_distance, successor))
+        raise Synthesis_Error("no feasible solution")
+
+    def bmc_interleaving(self, dp_table, prefer_concurrent):
+        '''alternative to determine_reachable and extract_solution that encodes the search for a feasible path through the dp table as a bounded model checking problem:
+        the conductor variables are copied for every step of the path and a progress counter per consumer selects the consumer demands the step has to satisfy.
+        Like in determine_reachable, every entry of the path but the last has to be feasible.
+
+        The bound (number of steps) is increased from the length of the longest transition until the solver finds a path, such that with prefer_concurrent
+        the path has the fewest (most concurrent) steps. Otherwise, paths that advance a single consumer per step are tried first.'''
+        last = [len(transition) - 1 for transition in dp_table]
+        variables = []
+        for wire in self.wires.values():
+            variables.extend(self.vars[name] for name in self.get_names(wire.name) + [wire.name + "_"])
+        #updatable variables keep their values during the transition and are not copied
+        problem = z3.And(*self.problem.assertions())
+        demands = [[self.translate_state_dict(demand) for demand, _ in transition] for transition in dp_table]
+        for sequential in ([False] if prefer_concurrent else [True, False]):
+            solver = z3.Solver()
+            progress = [[z3.Int("progress_%d@0" % j) for j in range(len(last))]]
+            solver.add([counter == 0 for counter in progress[0]])
+            for k in range(sum(last) + 1):
+                if k >= (sum(last) if sequential else max(last)):
+                    solver.push()
+                    solver.add([counter == l for counter, l in zip(progress[k], last)])
+                    if solver.check() == z3.sat:
+                        model = solver.model()
+                        return [tuple(model.eval(counter, model_completion = True).as_long() for counter in step) for step in progress]
+                    solver.pop()
+                if k == sum(last):
+                    break
+                #entry selected by the counters of step k must be feasible
+                copies = [(var, z3.Const("%s@%d" % (var, k), var.sort())) for var in variables]
+                solver.add(z3.substitute(problem, *copies))
+                for j, counter in enumerate(progress[k]):
+                    for i, demand in enumerate(demands[j]):
+                        solver.add(z3.Implies(counter == i, z3.substitute(demand, *copies)))
+                #step k + 1 advances at least one consumer (exactly one if sequential) by one transition step
+                progress.append([z3.Int("progress_%d@%d" % (j, k + 1)) for j in range(len(last))])
+                advanced = []
+                for counter, successor, l in zip(progress[k], progress[k + 1], last):
+                    solver.add(successor >= counter, successor <= counter + 1, successor <= l)
+                    advanced.append(z3.If(successor > counter, 1, 0))
+                if sequential:
+                    solver.add(z3.Sum(advanced) == 1)
+                else:
+                    solver.add(z3.Sum(advanced) >= 1)
+        raise Synthesis_Error("no feasible solution")
+
+    def greedy_interleaving(self, dp_table, prefer_concurrent, max_entries = 1 << 20):
+        '''heuristic alternative to determine_reachable and extract_solution: builds the path through the dp table one step at a time. A step advances one
+        consumer after another (with prefer_concurrent as many as possible, otherwise only the first that can advance), together with the consumers whose
+        current demands are incompatible with its next demand (pairwise checks, memoized), if the resulting entry is feasible.
+
+        If no consumer can advance, the rest of the path is searched with determine_reachable on the remaining part of the table, and if that fails too,
+        on the entire table (unless they have more than max_entries entries). Records in self.last_interleaving_complete if the path was found by the
+        exhaustive search of the entire table, otherwise it is feasible but may be less concurrent than the one determine_reachable finds.'''
+        last = tuple(len(transition) - 1 for transition in dp_table)
+        d = len(last)
+        pairs = {}
+        def compatible(j, a, k, b):
+            if not (j, a, k, b) in pairs:
+                constraints = copy.deepcopy(dp_table[j][a][0])
+                try:
+                    unite_dict(constraints, dp_table[k][b][0])
+                    pairs[(j, a, k, b)] = self.check_constraints(constraints)
+                except State_Space_Error:
+                    pairs[(j, a, k, b)] = False
+            return pairs[(j, a, k, b)]
+        self.last_interleaving_complete = False
+        cell = tuple(0 for _ in range(d))
+        sequence = [cell]
+        if self.check_feasibility(cell, dp_table):
+            while cell != last:
+                successor = cell
+                for j in range(d):
+                    if successor[j] != cell[j] or cell[j] == last[j]:
+                        continue
+                    candidate = list(successor)
+                    candidate[j] += 1
+                    group = [j]
+                    blocked = False
+                    #consumers in conflict with the next demand of a consumer of the group have to advance as well
+                    for a in group:
+                        for k in range(d):
+                            if k in group or compatible(a, candidate[a], k, candidate[k]):
+                                continue
+                            if successor[k] != cell[k] or cell[k] == last[k]:
+                                blocked = True
+                                break
+                            candidate[k] += 1
+                            group.append(k)
+                        if blocked:
+                            break
+                    candidate = tuple(candidate)
+                    #the last entry does not have to be feasible
+                    if not blocked and (candidate == last or self.check_feasibility(candidate, dp_table)):
+                        successor = candidate
+                        if not prefer_concurrent:
+                            break
+                if successor == cell:
+                    break
+                cell = successor
+                sequence.append(cell)
+            if cell == last:
+                return sequence
+            #stuck, search the rest of the path exhaustively
+            remaining = [transition[i:] for transition, i in zip(dp_table, cell)]
+            if np.prod([len(transition) for transition in remaining], dtype = float) <= max_entries:
+                try:
+                    path = self.extract_solution(*self.determine_reachable(remaining, prefer_concurrent))
+                    return sequence + [tuple(i + j for i, j in zip(cell, entry)) for entry in path[1:]]
+                except Synthesis_Error:
+                    pass
+        if np.prod([len(transition) for transition in dp_table], dtype = float) > max_entries:
+            raise Synthesis_Error("no feasible solution found, the dp table is too large to search it exhaustively")
+        self.last_interleaving_complete = True
+        return self.extract_solution(*self.determine_reachable(dp_table, prefer_concurrent))
+
+    def plan_interleaving(self, dp_table, flags):
+        '''returns a feasible path through the dp table using the planner selected by flags.interleaving_planner'''
+        prefer_concurrent = True if flags is None else flags.prefer_concurrent_interleaving
+        planner = "dp" if flags is None else flags.interleaving_planner
+        if planner == "greedy":
+            return self.greedy_interleaving(dp_table, prefer_concurrent)
+        #the other planners search exhaustively
+        self.last_interleaving_complete = True
+        if planner == "dp":
+            workers = 0 if flags is None else flags.feasibility_workers
+            return self.extract_solution(*self.determine_reachable(dp_table, prefer_concurrent, workers))
+        elif planner == "astar":
+            return self.astar_interleaving(dp_table, prefer_concurrent)
+        elif planner == "bmc":
+            return self.bmc_interleaving(dp_table, prefer_concurrent)
+        raise Synthesis_Error("unknown interleaving planner %s" % str(planner))
+
     #extracts interleaving found by dynamic programming (determine_reachable)
     def extract_solution(self, reachable, dimensions):
         '''extracts a path through the dp table from the reachable table constructed by determine_reachable'''
@@ -1434,7 +2351,7 @@ class Topology(object):
         while not current == fill_value:
             sequence.append(current)
             #numpy complains about tuple(reachable[current])...
-            current = tuple(reachable[current][i] for i in range(len(dimensions)))
+            current = tuple(int(reachable[current][i]) for i in range(len(dimensions)))
         list.reverse(sequence)
         return sequence
 
@@ -1479,15 +2396,107 @@ class Topology(object):
                     node_state_dict_copy[node] = initial_state + self.nodes[node].get_transition(self.current_node_state[node], node_state_dict_copy[node])
         if(node_state_dict_copy == {}):
             return #no changes required, consumers are already in requested states
+        key = None
+        if not self.transition_table is None:
+            key = self.transition_key(node_state_dict, flags)
+        if not key is None:
+            plan = self.transition_table.get(key)
+            if not plan is None:
+                self.replay_transition(plan, flags)
+                return
+            self.recorded_steps = []
+        try:
+            sequence, node_list = self.solve_transition(node_state_dict_copy, initial_dict, flags)
+            if not key is None:
+                self.transition_table.add(key, {
+                    "interleaving" : (node_list, sequence),
+                    "steps" : self.recorded_steps,
+                    "node_states" : copy.deepcopy(self.current_node_state),
+                    "attributes" : self.component_attributes()
+                })
+        finally:
+            self.recorded_steps = None
+
+    def solve_transition(self, node_state_dict_copy, initial_dict, flags):
+        '''plans and applies the transitions of stateful_node_update, returns the feasible path through the dp table and the consumers of its dimensions'''
         node_list = list(node_state_dict_copy.keys())
         dp_table = list(map(lambda node: node_state_dict_copy[node], node_state_dict_copy))
         self.problem.push()
-        self.problem.add(self.translate_state_dict(self.extend_to_stateful_nodes({}, set(node_state_dict_copy.keys()))))
-        reachable = self.determine_reachable(dp_table, True if flags is None else flags.prefer_concurrent_interleaving)
-        self.problem.pop()
-        sequence = self.extract_solution(*reachable)
+        context = self.extend_to_stateful_nodes({}, set(node_state_dict_copy.keys()))
+        self.problem.add(self.translate_state_dict(context))
+        self.transition_context = context
+        #feasibility checks of this transition depend on the platform, its updatable states and the demands of the other consumers
+        self.feasibility_context = None if self.z3_fingerprint is None else digest([self.z3_fingerprint, self.updatable_vars, context])
+        try:
+            sequence = self.plan_interleaving(dp_table, flags)
+            dp_log.debug("interleaving of %s: %s", node_list, sequence)
+        finally:
+            self.feasibility_context = None
+            self.transition_context = {}
+            self.problem.pop()
         interleaving = self.construct_interleavings(sequence, dp_table, node_list)
         self.apply_transitions(interleaving, initial_dict, flags)
+        return sequence, node_list
+
+    def topology_hash(self):
+        '''returns a fingerprint of the platform (its components and the z3 encoding of its conductors), None if it cannot be identified'''
+        if self.z3_fingerprint is None:
+            return None
+        components = [[name, type(node).__name__, node.bus_addr, node.durations] for name, node in sorted(self.nodes.items())]
+        return digest([self.z3_fingerprint, components])
+
+    def component_attributes(self):
+        '''returns copies of the plain data attributes of all components (e.g. if a device has already been configured)'''
+        attributes = {}
+        for name, node in self.nodes.items():
+            attributes[name] = {attr : copy.deepcopy(value) for attr, value in vars(node).items() if plain_data(value)}
+        return attributes
+
+    def transition_key(self, node_state_dict, flags):
+        '''returns the key of the consumer transition to node_state_dict from the current virtual platform state in self.transition_table,
+        None if the transition cannot be identified (it must not be cached)'''
+        if self.topology_hash() is None:
+            return None
+        if flags is None:
+            flags = State_Search_Flags(all_solutions = False)
+        order = self.search_order()
+        if order is None:
+            return None
+        target = dict(self.current_node_state)
+        target.update(node_state_dict)
+        state = [self.current_node_state, self.current_wire_state, self.current_wire_state_range, self.updatable_vars, self.component_attributes()]
+        return digest([self.topology_hash(), state, target, flags.result_options(), order])
+
+    def search_order(self):
+        '''returns the order in which the search considers the conductors (sorted_wires) and their State Possibilities (identified by their z3 constraints),
+        which decides the first solution found. None if a State Possibility is not part of the z3 problem (generate_z3_solver was not called after changing it)'''
+        possibilities = {}
+        for name, wire in self.wires.items():
+            possibilities[name] = []
+            for possibility in wire.constraints:
+                entry = self.possibility_hashes.get(id(possibility))
+                if entry is None or not entry[0] is possibility:
+                    return None
+                possibilities[name].append(entry[1])
+        return [list(self.sorted_wires), possibilities]
+
+    def replay_transition(self, plan, flags):
+        '''applies a plan of self.transition_table: performs its state updates and emits its commands like apply_transitions'''
+        no_output = False if flags is None else flags.no_output
+        for wire_state_range, wire_state, commands, remark, timing in plan["steps"]:
+            self.state_update(copy.deepcopy(wire_state_range), copy.deepcopy(wire_state))
+            if not timing is None:
+                self.timings.append(Timing_Analysis.from_data(timing))
+            if not no_output and not commands.isspace():
+                sequence_log.info("%s", commands)
+            self.commands += commands
+            if remark:
+                sequence_log.info("%s\n", remark)
+        self.current_node_state.update(plan["node_states"])
+        for name, attributes in plan["attributes"].items():
+            vars(self.nodes[name]).update(copy.deepcopy(attributes))
+        #the support of the last applied solution is not known
+        self.incremental_support = None
 
 
                 
@@ -1503,8 +2512,9 @@ class Topology(object):
         for element, remark, label in interleaving:
             self.apply_changes(element, flags, label = label + "G" + str(i))
             if not remark.isspace():
-                print(remark.strip())
-                print("")
+                sequence_log.info("%s\n", remark.strip())
+                if not self.recorded_steps is None:
+                    self.recorded_steps[-1][3] = remark.strip()
             i = i + 1
         flags.ignore_nodes = inital_ignore_nodes
         for node in node_state_dict:
@@ -1514,11 +2524,24 @@ class Topology(object):
     #-------------------------------------------------------------------------------------------
 
     
-    def parametrized_state_search(self, wire_state_dict, flags, expected_solutions = None, label = ""):
-        '''performs state generation on the consumer demands specified by wire_state_dict, parametrised by flags'''
+    def extend_demands(self, wire_state_dict, flags):
+        '''returns a copy of the consumer demands wire_state_dict extended to the current consumer power states (and to all conductors if flags.extend is set)'''
         new_wire_state_dict = self.extend_to_stateful_nodes(wire_state_dict, flags.ignore_nodes)
         if flags.extend:
             unite_dict(new_wire_state_dict, self.most_general_state)
+        return new_wire_state_dict
+
+    def iter_solutions(self, wire_state_dict, flags):
+        '''lazily performs state generation on the consumer demands specified by wire_state_dict, parametrised by flags.
+
+        Yields one feasible state assignment (a proposed states dictionary) at a time, the corresponding update sequence
+        can be constructed on demand with create_update_sequence. The search only continues when the next assignment is requested.'''
+        return self.generate_solutions(self.extend_demands(wire_state_dict, flags), flags)
+
+    def parametrized_state_search(self, wire_state_dict, flags, expected_solutions = None, label = ""):
+        '''performs state generation on the consumer demands specified by wire_state_dict, parametrised by flags'''
+        new_wire_state_dict = self.extend_demands(wire_state_dict, flags)
+        self.solution_support = []
         
         if not flags.all_solutions: #uses present wire_state_range to determine if new search is necessary
             try:
@@ -1534,6 +2557,8 @@ class Topology(object):
                         monitor_sequence.append(name)
                 sequence = [set_sequence, monitor_sequence]
                 #command_string = self.construct_command_string(sequence, new_states)
+                #the new states lie within the present state ranges, the previous support stays valid
+                self.solution_support = [self.incremental_support]
                 return [(copy.deepcopy(self.current_wire_state_range), new_states, 0, sequence)]
             except (State_Space_Error, KeyError, Set_Error):
                 pass
@@ -1581,10 +2606,387 @@ class Topology(object):
     # given a list of desired states, returns all possible update sequences
     def synthesize_wire_updates(self, wire_state_dict, flags):
         '''the implementation of our state generation procedure, find feasible state assignment(s) for consumer demands specified by wire_state_dict'''
+        if flags.minimize_changes:
+            return self.minimal_change_updates(wire_state_dict, flags)
+        if flags.all_solutions and flags.parallel_workers > 1 and not flags.decompose_components and "fork" in multiprocessing.get_all_start_methods():
+            return self.parallel_wire_updates(wire_state_dict, flags)
+        if flags.incremental:
+            demands = copy.deepcopy(wire_state_dict)
+            if not flags.all_solutions and not self.incremental_support is None:
+                result = self.incremental_wire_updates(demands, flags)
+                if not result is None:
+                    self.solution_support.append((demands, result[1]))
+                    return [result[0]]
+                #fall back to a search of all conductors
+        if flags.restarts and not flags.all_solutions:
+            return self.restarting_wire_updates(wire_state_dict, flags)
         change_options = []
+        for proposed_states in self.generate_solutions(wire_state_dict, flags):
+            solution = self.create_update_sequence(proposed_states, flags)
+            if not solution is None:
+                change_options.append(solution)
+                if flags.incremental:
+                    self.solution_support.append((demands, proposed_states))
+                if flags.print_solutions:
+                    print(change_options[-1][3])
+            else:
+                search_log.error("solution is None")
+                assert(0 == 1)
+            if not flags.all_solutions: #solution was found and only one solution required
+                break
+        return change_options
+
+    def restarting_wire_updates(self, wire_state_dict, flags):
+        '''searches a single solution with restarts: every run is aborted once it processed more choices than its cutoff, the next run shuffles the
+        conductor order and the order of the State Possibilities anew. The first run uses the regular orders, the last one is not bounded.
+
+        The seed of every run is recorded in self.restart_seeds as (seed, cutoff, found), runs are reproducible from flags.restart_seed.'''
+        demands = copy.deepcopy(wire_state_dict)
+        sorted_wires = self.sorted_wires
+        seeds = random.Random(flags.restart_seed)
+        self.restart_seeds = []
+        try:
+            for run, cutoff in enumerate(restart_cutoffs(flags)):
+                seed = None
+                rng = None
+                if run > 0:
+                    seed = seeds.randrange(1 << 32)
+                    rng = random.Random(seed)
+                    self.sorted_wires = list(sorted_wires)
+                    rng.shuffle(self.sorted_wires)
+                try:
+                    for proposed_states in self.generate_assignments(copy.deepcopy(demands), flags, rng = rng, cutoff = cutoff):
+                        solution = self.create_update_sequence(proposed_states, flags)
+                        self.restart_seeds.append((seed, cutoff, True))
+                        if solution is None:
+                            return []
+                        if flags.incremental:
+                            self.solution_support.append((demands, proposed_states))
+                        if flags.print_solutions:
+                            print(solution[3])
+                        return [solution]
+                    #the run was complete, there is no solution
+                    self.restart_seeds.append((seed, cutoff, False))
+                    return []
+                except Search_Cutoff:
+                    self.restart_seeds.append((seed, cutoff, False))
+        finally:
+            self.sorted_wires = sorted_wires
+            self.update_wire_ranks()
+        return []
+
+    def minimal_change_updates(self, wire_state_dict, flags):
+        '''branch-and-bound search for the solution that keeps the most conductors in their current state, i.e. the one apply_changes
+        would pick among all solutions. Returns a list containing only that solution (empty if there is none).'''
+        demands = copy.deepcopy(wire_state_dict)
+        bound = [-1]
+        best = None
+        for proposed_states in self.generate_assignments(wire_state_dict, flags, bound = bound):
+            solution = self.create_update_sequence(proposed_states, flags)
+            #the bound is optimistic, the solution may keep fewer states than it promised
+            if not solution is None and solution[2] > bound[0]:
+                best = (solution, proposed_states)
+                bound[0] = solution[2]
+        if best is None:
+            return []
+        if flags.incremental:
+            self.solution_support.append((demands, best[1]))
+        if flags.print_solutions:
+            print(best[0][3])
+        return [best[0]]
+
+    def fan_in_cone(self, wires):
+        '''returns the conductors whose states may be restricted (transitively) by the conductors in wires, including wires'''
+        cone = set(wires)
+        stack = list(cone)
+        while stack:
+            for name in self.wire_fan_in.get(stack.pop(), ()):
+                if not name in cone:
+                    cone.add(name)
+                    stack.append(name)
+        return cone
+
+    def incremental_wire_updates(self, wire_state_dict, flags):
+        '''finds a solution for the (extended) consumer demands wire_state_dict by only searching the fan-in cone of the demands that changed since
+        the last applied solution (self.incremental_support), all other conductors keep the State Possibilities chosen for that solution.
+
+        Returns the update sequence and proposed states of the solution, or None if the cone cannot be solved that way.'''
+        demands, previous = self.incremental_support
+        changed = {name for name in set(demands) | set(wire_state_dict) if demands.get(name) != wire_state_dict.get(name)}
+        cone = self.fan_in_cone(changed | self.updated_wires)
+        cone_demands = {name: copy.deepcopy(state) for name, state in wire_state_dict.items() if name in cone}
+        #the State Possibilities kept outside the cone restrict the conductors inside it
+        try:
+            for name, (_, _, _, raw_req) in previous.items():
+                if name in cone:
+                    continue
+                for req_name, state in raw_req.items():
+                    if req_name in cone:
+                        cone_demands[req_name] = intersect(cone_demands[req_name], state) if req_name in cone_demands else copy.deepcopy(state)
+        except State_Space_Error:
+            return None
+        for proposed_states in self.generate_solutions(cone_demands, flags):
+            proposed_states = dict(proposed_states)
+            for name, value in previous.items():
+                if not name in cone:
+                    proposed_states[name] = value
+            solution = self.create_update_sequence(proposed_states, flags)
+            return None if solution is None else (solution, proposed_states)
+        return None
+
+    def count_solutions(self, wire_state_dict, flags):
+        '''returns the number of feasible state assignments (solutions of parametrized_state_search with all_solutions) for the consumer demands wire_state_dict,
+        without enumerating them: independent subsystems are counted separately and the counts of residual problems are cached'''
+        return self.count_residual(self.extend_demands(wire_state_dict, flags), {}, [], {})
+
+    def count_residual(self, pending, decided, complex_constraints, cache):
+        '''counts the solutions of a residual problem:
+
+        pending: restrictions of the conductors that still must be decided
+
+        decided: states of the conductors whose State Possibility was chosen already
+
+        complex_constraints: complex constraints of the chosen State Possibilities, as (function, [(conductor, index)])
+
+        cache: maps canonical residual problems to their count'''
+        components = self.residual_components(pending, decided, complex_constraints)
+        count = 1
+        for component_pending, component_decided, component_constraints in components:
+            if component_pending == {}:
+                count *= 1 if self.check_complex_constraints(component_decided, component_constraints) else 0
+            else:
+                count *= self.count_component(component_pending, component_decided, component_constraints, cache)
+            if count == 0:
+                break
+        return count
+
+    def residual_components(self, pending, decided, complex_constraints):
+        '''splits a residual problem into independent ones. Conductors are coupled through undecided conductors and through decided ones whose state may still change,
+        decided conductors with a single state cannot be narrowed any further and do not couple the conductors depending on them.'''
+        constraint_wires = [set(name for name, _ in variables) for _, variables in complex_constraints]
+        coupled = {}
+        for i, wires in enumerate(constraint_wires):
+            for wire in wires:
+                coupled.setdefault(wire, []).append(i)
+        component_of = {}
+        components = []
+        for wire in sorted(pending, key = self.wire_sort_function):
+            if wire in component_of:
+                continue
+            index = len(components)
+            members = {wire}
+            component_of[wire] = index
+            stack = [wire]
+            while stack:
+                current = stack.pop()
+                if current in decided and is_fixed_state(decided[current]):
+                    continue
+                #decided conductors that are not fixed couple all conductors that may narrow them
+                neighbours = set(self.wire_neighbours[current])
+                for i in coupled.get(current, []):
+                    neighbours |= constraint_wires[i]
+                for neighbour in neighbours:
+                    if not neighbour in members:
+                        members.add(neighbour)
+                        if not neighbour in component_of or neighbour in decided:
+                            component_of.setdefault(neighbour, index)
+                            stack.append(neighbour)
+            components.append(members)
+        result = []
+        for members in components:
+            constraints = [c for c, wires in zip(complex_constraints, constraint_wires) if wires & members]
+            #conductors with a single state may be shared by several subproblems
+            relevant = members.union(*[wires for wires in constraint_wires if wires & members])
+            result.append((
+                {wire: pending[wire] for wire in members if wire in pending},
+                {wire: decided[wire] for wire in relevant if wire in decided},
+                constraints
+            ))
+        #complex constraints that no longer depend on undecided conductors
+        remaining = [c for i, c in enumerate(complex_constraints) if not any(constraint_wires[i] & members for members in components)]
+        if remaining != []:
+            result.append(({}, decided, remaining))
+        return result
+
+    def count_component(self, pending, decided, complex_constraints, cache):
+        '''counts the solutions of a single coupled residual problem by choosing a State Possibility for its first undecided conductor'''
+        key = (
+            frozenset((wire, freeze_state(state)) for wire, state in pending.items()),
+            frozenset((wire, freeze_state(state)) for wire, state in decided.items()),
+            tuple((id(fun), tuple(variables)) for fun, variables in complex_constraints)
+        )
+        if key in cache:
+            return cache[key]
+        wire = min(pending, key = self.wire_sort_function)
+        count = 0
+        for state, requirements, constraints, _ in self.wires[wire].possible(pending[wire]):
+            new_pending = dict(pending)
+            del new_pending[wire]
+            new_decided = dict(decided)
+            new_decided[wire] = state
+            try:
+                for name, requirement in requirements.items():
+                    if name in new_decided:
+                        new_decided[name] = intersect(new_decided[name], requirement)
+                    elif name in new_pending:
+                        new_pending[name] = intersect(new_pending[name], requirement)
+                    else:
+                        new_pending[name] = requirement
+            except State_Space_Error:
+                continue
+            count += self.count_residual(new_pending, new_decided, complex_constraints + list(constraints), cache)
+        cache[key] = count
+        return count
+
+    def check_complex_constraints(self, decided, complex_constraints):
+        '''uses z3 to check if the final states of decided conductors satisfy the given complex constraints'''
+        if complex_constraints == []:
+            return True
+        problem = z3.Solver()
+        variables = {}
+        for fun, names in complex_constraints:
+            constraint_vars = []
+            for name, index in names:
+                varname = name + str(index)
+                if not varname in variables:
+                    variables[varname] = z3.Int(varname)
+                    problem.add(self.translate_state([decided[name][index]], [varname], variables))
+                constraint_vars.append(variables[varname])
+            problem.add(fun(*constraint_vars))
+        return problem.check() == z3.sat
+
+    def split_components(self, wire_state_dict):
+        '''splits the consumer demands wire_state_dict into the demands of independent subsystems (connected components of the interaction graph)'''
+        components = []
+        component_of = {}
+        for wire in sorted(wire_state_dict, key = self.wire_sort_function):
+            if wire in component_of:
+                components[component_of[wire]][wire] = wire_state_dict[wire]
+                continue
+            index = len(components)
+            components.append({wire: wire_state_dict[wire]})
+            component_of[wire] = index
+            stack = [wire]
+            while stack:
+                for neighbour in self.wire_neighbours[stack.pop()]:
+                    if not neighbour in component_of:
+                        component_of[neighbour] = index
+                        stack.append(neighbour)
+        return components
+
+    def encode_assignment(self, proposed_states):
+        '''replaces the dependencies in proposed_states with the index of their State Possibility, such that the assignment can be passed between processes'''
+        encoded = {}
+        for wire, (state, index, dependency, raw_req) in proposed_states.items():
+            number = next(i for i, possibility in enumerate(self.wires[wire].constraints) if possibility[Possibility.Dependency] == dependency)
+            encoded[wire] = (state, index, number, raw_req)
+        return encoded
+
+    def decode_assignment(self, encoded):
+        '''inverse of encode_assignment'''
+        return {wire: (state, index, self.wires[wire].constraints[number][Possibility.Dependency], raw_req) for wire, (state, index, number, raw_req) in encoded.items()}
+
+    def generate_solutions(self, wire_state_dict, flags):
+        '''generator that yields the feasible state assignments for the (already extended) consumer demands wire_state_dict.
+
+        If flags.decompose_components is set, the independent subsystems of the platform are solved separately and their assignments are combined,
+        otherwise this is generate_assignments. The subsystems are searched lazily, only as far as the combinations taken from the generator need.
+        With flags.parallel_workers > 1, the subsystems are instead solved completely (in parallel) before the first combination is yielded.'''
+        if not flags.decompose_components:
+            yield from self.generate_assignments(wire_state_dict, flags)
+            return
+        global _parallel_topology
+        components = self.split_components(wire_state_dict)
+        if flags.parallel_workers > 1 and len(components) > 1 and "fork" in multiprocessing.get_all_start_methods():
+            _parallel_topology = self
+            try:
+                with ProcessPoolExecutor(flags.parallel_workers, mp_context = multiprocessing.get_context("fork")) as executor:
+                    futures = [executor.submit(_solve_component, component, flags) for component in components]
+                    solutions = [list(map(self.decode_assignment, future.result())) for future in futures]
+            finally:
+                _parallel_topology = None
+        else:
+            solutions = []
+            for component in components:
+                assignments = self.generate_assignments(component, flags)
+                if not flags.all_solutions:
+                    assignments = itertools.islice(assignments, 1)
+                solutions.append(assignments)
+        for combination in lazy_product(solutions):
+            proposed_states = {}
+            for assignment in combination:
+                proposed_states.update(assignment)
+            yield proposed_states
+
+    def split_search(self, wire_state_dict, flags, units):
+        '''splits the search for all solutions of wire_state_dict into subtrees, each described by the path of choices leading to it.
+        
+        Choice points are expanded breadth first until there are at least "units" subtrees or flags.split_depth choice points have been split'''
+        paths = [()]
+        for depth in range(flags.split_depth):
+            if len(paths) >= units:
+                break
+            new_paths = []
+            for path in paths:
+                if len(path) < depth:
+                    #no further choice point below path
+                    new_paths.append(path)
+                    continue
+                try:
+                    for _ in self.generate_assignments(copy.deepcopy(wire_state_dict), flags, path, probe = True):
+                        pass
+                    new_paths.append(path)
+                except Branch_Point as branch:
+                    new_paths.extend(path + (i,) for i in range(branch.count))
+            paths = new_paths
+        return paths
+
+    def parallel_wire_updates(self, wire_state_dict, flags):
+        '''enumerates all solutions for the consumer demands specified by wire_state_dict using flags.parallel_workers processes.
+
+        The search tree is split into more subtrees than workers, idle workers pick up the next pending subtree so unevenly sized subtrees balance out.
+        Solutions are returned in the order of their subtrees, independently of which worker finished first.'''
+        global _parallel_topology
+        paths = self.split_search(wire_state_dict, flags, 4 * flags.parallel_workers)
+        _parallel_topology = self
+        try:
+            with ProcessPoolExecutor(flags.parallel_workers, mp_context = multiprocessing.get_context("fork")) as executor:
+                futures = [executor.submit(_enumerate_subtree, copy.deepcopy(wire_state_dict), flags, path) for path in paths]
+                change_options = list(itertools.chain.from_iterable(future.result() for future in futures))
+        finally:
+            _parallel_topology = None
+        if flags.print_solutions:
+            for solution in change_options:
+                print(solution[3])
+        return change_options
+
+    def generate_assignments(self, wire_state_dict, flags, path = (), probe = False, bound = None, rng = None, cutoff = None):
+        '''generator that yields the feasible state assignments (proposed states) for the (already extended) consumer demands specified by wire_state_dict.
+
+        path: indices of the State Possibilities taken at the first choice points with several possibilities, restricts the search to that subtree
+
+        probe: if set, raises Branch_Point once the search reaches a choice point with several possibilities that is not covered by path
+
+        bound: one-element list holding the most conductors kept in their current state by a solution found so far, if given
+        the search prunes all branches that cannot keep more (the caller raises it whenever it finds a better solution)
+
+        rng: random.Random instance used to shuffle the State Possibilities of every choice point
+
+        cutoff: if not None, raises Search_Cutoff once the search has processed more choices'''
+        #the search changes flags.aggressive after the first solution, the caller's flags are left untouched
+        flags = copy.copy(flags)
         for key in wire_state_dict:
             wire_state_dict[key] = (wire_state_dict[key], None)
+        self.update_wire_ranks()
         current = Synth_state(None, None, wire_state_dict, {}, [], {})
+        current.path = path
+        current.probe = probe
+        current.best_keep = bound
+        current.rng = rng
+        current.cutoff = cutoff
+        if not bound is None:
+            current.within_bound(wire_state_dict, self)
+        current.init_frontier(self, flags)
         (synth, choices) = current.state_space_search([], self, flags)
         flags.aggressive = False
         while not synth is None:
@@ -1610,38 +3012,20 @@ class Topology(object):
                             synth.proposed_states[wire_name][ProposedState.State][index] = {model[d].as_long()}
                         else:
                             synth.proposed_states[wire_name][ProposedState.State][index] = (model[d].as_long(), model[d].as_long())
-                    solution = self.create_update_sequence(synth.proposed_states, flags)
-                   
-                    if not solution is None:
-                        change_options.append(solution)
-                        if flags.print_solutions:
-                            print(change_options[-1][3])
-                    else: 
-                        print("solution is None")
-                        assert(0 == 1)
+                    yield synth.proposed_states
                 else: 
-                    print("z3 failed")
+                    search_log.warning("z3 failed")
             else:
-                solution = self.create_update_sequence(synth.proposed_states, flags)
-                if not solution is None:
-                    change_options.append(solution)
-                    if flags.print_solutions:
-                        print(change_options[-1][3])
-                else:
-                    print("solution is None")
-                    assert(0 == 1)
+                yield synth.proposed_states
             if choices != []:
-                if (not flags.all_solutions) and (change_options != []): #solution was found and only one solution required
-                    synth = None #breaks loop
+                #reverting replaces the execution state with copies, the yielded assignment stays untouched
+                choices = synth.revert(choices, flags, self, avoid)
+                if choices is None:
+                    synth = None
                 else:
-                    choices = synth.revert(choices, flags, self, avoid)
-                    if choices is None:
-                        synth = None
-                    else:
-                        (synth, choices) = synth.state_space_search(choices, self, flags)
+                    (synth, choices) = synth.state_space_search(choices, self, flags)
             else:
-                synth = None    
-        return change_options
+                synth = None
 
     #generates all possible state updates and selects the one that compared to the current state requires the fewest changes
     def apply_changes(self, wire_state_dict, flags = None, label = ""):
@@ -1666,8 +3050,15 @@ class Topology(object):
         if options == []:
             raise Synthesis_Error(
                 "could not find an update sequence for %s that results in desired values" % str(wire_state_dict))
-        #if several solutions, applies solution that requires fewest updates -> the largest number of states kept the same
-        updates = max(options, key=lambda x: x[2])
+        #if several solutions, applies the best one according to flags.ranking (by default the one that keeps the most states the same)
+        best = self.rank_solutions(options, flags.ranking)[0]
+        updates = options[best]
+        search_log.debug("%s: applying solution %d of %d", label, best, len(options))
+
+        if flags.incremental:
+            #remember the applied solution, state updates of the virtual platform state may change State Possibilities afterwards
+            self.incremental_support = self.solution_support[best] if len(self.solution_support) == len(options) else None
+            self.updated_wires = set()
 
         if flags.return_graph:
             graph_file = open("results/eval3_%s.txt"%label_graph, 'w')
@@ -1676,7 +3067,13 @@ class Topology(object):
             
 
         #only construct commmand sequence once option has been selected -> construction might influence topology state!
-        commands = self.construct_command_string(updates[3], updates[1])
+        commands = self.construct_command_string(updates[3], updates[1], flags.concurrent_emission)
+        timing = None
+        if flags.timing:
+            timing = self.analyse_timing(updates[3], updates[4] if len(updates) > 4 else None)
+        if not timing is None:
+            self.timings.append(timing)
+            search_log.debug("%s: predicted duration %.3f s, critical path %s", label, timing.boot_time, timing.critical_path)
 
         self.state_update(updates[0], updates[1])
 
@@ -1687,27 +3084,127 @@ class Topology(object):
         
 
         if not flags.no_output and not commands.isspace(): #if unchanged not recorded, updates[3] might be an empty string
-            print(commands)
+            sequence_log.info("%s", commands)
         self.commands += commands
+        if not self.recorded_steps is None:
+            self.recorded_steps.append([copy.deepcopy(updates[0]), copy.deepcopy(updates[1]), commands, "", None if timing is None else timing.data()])
         return(updates[0], updates[1]) #returns changes 
     
     
+    def component_snapshot(self, names = None):
+        '''returns copies of all attributes of the components names (all if None, see restore_component_snapshot),
+        the components and conductors they refer to are not copied'''
+        if names is None:
+            names = self.nodes.keys()
+        memo = {id(wire) : wire for wire in self.wires.values()}
+        memo.update({id(node) : node for node in self.nodes.values()})
+        return {name : copy.deepcopy(vars(self.nodes[name]), memo) for name in names}
+
+    def restore_component_snapshot(self, snapshot):
+        '''restores the components to a snapshot returned by component_snapshot, the snapshot must not be used again'''
+        for name, attributes in snapshot.items():
+            node_attributes = vars(self.nodes[name])
+            node_attributes.clear()
+            node_attributes.update(attributes)
+
+    def solution_cost(self, solution, ranking):
+        '''returns the cost of a candidate solution (see solution_costs) according to ranking: a tuple for a lexicographic ranking, a number otherwise'''
+        if isinstance(ranking, str):
+            ranking = [ranking]
+        try:
+            costs = [solution_costs[name] for name in ranking]
+        except KeyError as e:
+            raise Synthesis_Error("unknown cost %s" % str(e))
+        commands = None
+        if any(needs_commands for _, needs_commands in costs):
+            #constructing commands changes components (e.g. if they are configured), the candidate may not be applied.
+            #Only the components connected to the conductors of its events (which set them or monitor them) construct commands
+            wires = [self.wires[self.event_conductor(name)[0]] for rank in solution[3] for name in rank]
+            snapshot = self.component_snapshot({node.name for wire in wires for node in [wire.output_device] + [node for node, _ in wire.input_set]})
+            try:
+                command_string = self.construct_command_string(solution[3], solution[1])
+            finally:
+                self.restore_component_snapshot(snapshot)
+            commands = [command for command in command_string.split("\n") if command and command != "#"]
+        values = [function(self, solution, commands) for function, _ in costs]
+        if isinstance(ranking, dict):
+            return sum(ranking[name] * value for name, value in zip(ranking, values))
+        return tuple(values)
+
+    def rank_solutions(self, solutions, ranking = "keep", k = 1):
+        '''returns the indices of the (at most) k best solutions according to ranking (see State_Search_Flags.ranking), best first.
+        Solutions with equal costs keep their order.'''
+        return heapq.nsmallest(k, range(len(solutions)), key = lambda i: self.solution_cost(solutions[i], ranking))
+
+    def event_duration(self, name):
+        '''returns the duration of the event name given by the component that drives its conductor'''
+        event = self.event_ids[name]
+        wire = self.wires[self.event_names[event | 1]]
+        return wire.output_device.event_durations(wire.pin_name)[event & 1]
+
+    def analyse_timing(self, sequence, graph = None):
+        '''returns a Timing_Analysis of an update sequence (list of ranks of events) and its event graph (as returned by create_update_sequence).
+        Events of the graph that are not part of the sequence (conductors that keep their state) take no time. Without graph, the events of every rank
+        happen after all events of the previous rank.'''
+        if graph is None:
+            graph = {}
+            for previous, rank in zip([[]] + sequence, sequence):
+                for name in rank:
+                    graph[name] = set(previous)
+        event_graph = Event_Graph.from_dict(graph, {name : set() for rank in sequence for name in rank}, ids = self.event_ids)
+        ranks = event_graph.rank_sort()
+        if ranks is None:
+            return None
+        events = {name for rank in sequence for name in rank}
+        durations = [self.event_duration(name) if name in events else 0.0 for name in event_graph.names]
+        return Timing_Analysis(event_graph, ranks, durations)
+
+    def boot_time(self):
+        '''returns the predicted duration of all update sequences applied so far'''
+        return sum(timing.boot_time for timing in self.timings)
+
+    def event_conductor(self, name):
+        '''returns the name of the conductor of the event name and if it is the conductor's Initiate (set) event'''
+        if name in self.event_ids:
+            event = self.event_ids[name]
+            return self.event_names[event | 1], event & 1 == 0
+        #events without ID (e.g. of sequences not created by this topology) are resolved by their name, as in set_<wire> or <wire>
+        if name[:4] == "set_":
+            return name[4:], True
+        return name, False
+
     #constructs command string
-    def construct_command_string(self, sequence, new_states):
-        '''constructs the command string from the event sequence "sequence" passed to it, which has the platform transition to a state described by "new_states"'''
+    def construct_command_string(self, sequence, new_states, concurrent = False):
+        '''constructs the command string from the event sequence "sequence" passed to it, which has the platform transition to a state described by "new_states"
+
+        concurrent: the events of a rank are independent, if True the waits of a rank are emitted as tasks of a single run_concurrently call
+        (after the other commands of the rank, which stay sequential as they may access the same device)'''
         command_string = ""
         for seq in sequence:
+            waits = []
             for s in seq:
-                if s[:4] == "set_":
+                name, initiate = self.event_conductor(s)
+                if initiate:
                     #create command for an explicit set event
-                    command_string += self.wires[s[4:]].set(new_states[s[4:]]) + "\n"
+                    command_string += self.wires[name].set(new_states[name]) + "\n"
                 else:
                     #complete event:
                     #create command that ensures the wire state change was accomplished
-                    value = new_states[s]
-                    monitor_list = list(filter(lambda x: x[0], map(lambda x: x(value, new_states) , self.wires[s].monitors)))
+                    value = new_states[name]
+                    monitor_list = list(filter(lambda x: x[0], map(lambda x: x(value, new_states) , self.wires[name].monitors)))
                     if len(monitor_list) > 0:
-                        command_string += "\n".join(map(lambda x: x[1], monitor_list)) + "\n"
+                        if concurrent:
+                            for command in "\n".join(map(lambda x: x[1], monitor_list)).split("\n"):
+                                if command.startswith("wait_for"):
+                                    waits.append(command)
+                                else:
+                                    command_string += command + "\n"
+                        else:
+                            command_string += "\n".join(map(lambda x: x[1], monitor_list)) + "\n"
+            if len(waits) > 1:
+                command_string += "run_concurrently(\n" + "".join("    lambda: %s,\n" % wait for wait in waits) + ")\n"
+            elif len(waits) == 1:
+                command_string += waits[0] + "\n"
             command_string += "#\n"
         return command_string
 
@@ -1773,10 +3270,12 @@ class Topology(object):
     #only contains entries for wires whose state is going to change
     def construct_implicit_set_events(self, dependencies, new_state, remove_set):
         '''resolves implicit Initiate events to sets of explicit Initiate events'''
-        file_object = open('set_events.txt', 'a')
         implicit_set_events = dict(map(lambda x: (x[0], x[1][1][2](new_state)[x[0]]), dependencies.items()))
-        file_object.write("\n\n\n" + str(implicit_set_events) + "\n")
-        sequence = topological_sort(implicit_set_events)
+        if not self.trace is None:
+            implicit = trace_events(implicit_set_events)
+        graph = Event_Graph.from_dict(implicit_set_events, ids = self.event_ids)
+        ranks = graph.rank_sort()
+        sequence = None if ranks is None else graph.event_names(ranks)
         
         for wire in self.wires:
             #avoid key errors if already happened events are referenced
@@ -1798,10 +3297,9 @@ class Topology(object):
             for sublist in sequence[1:]:
                 for elem in sublist:
                     implicit_set_events[elem] = set().union(*map(lambda x: implicit_set_events[x], implicit_set_events[elem]))
-        
-        file_object.write(str(implicit_set_events) + "\n")
 
-        file_object.close()
+        if not self.trace is None:
+            self.trace.record("implicit_set_events", implicit = implicit, resolved = trace_events(implicit_set_events))
         return implicit_set_events
 
 
@@ -1844,21 +3342,22 @@ class Topology(object):
 
         implicit_events = self.construct_implicit_set_events(dependencies, new_states, remove_from_graph)
         graph = self.construct_graph_from_lists(dependencies, implicit_events, self.current_wire_state, remove_from_graph)
-        graph_copy = copy.deepcopy(graph)
-        
-
-        sequence = topological_sort(graph)
+        if graph is None:
+            return None
+        event_graph = Event_Graph.from_dict(graph, ids = self.event_ids)
+        ranks = event_graph.rank_sort()
 
-        if sequence is None:
+        if ranks is None:
             #there is no feasible sequence of commands;
             #None signals that solution this method was supposed to create is infeasible
             return None
 
-        sequence = list(map(lambda seq: list(filter(lambda x: x not in remove_from_graph, seq)), sequence))
+        removed = {event_graph.ids[name] for name in remove_from_graph if name in event_graph.ids}
+        sequence = event_graph.event_names([[event for event in rank if not event in removed] for rank in ranks])
 
         #command_string = self.construct_command_string(sequence, new_states)
 
-        return (new_state_range, new_states, keep_states, sequence, graph_copy)
+        return (new_state_range, new_states, keep_states, sequence, graph)
 
 
 
@@ -1877,9 +3376,230 @@ def max_none(c1, c2):
         return max(c1, c2)
 
 
+class Search_Cutoff(Exception):
+    '''raised when a search expanded more nodes than the cutoff of its restart allows'''
+    pass
+
+
+def luby(i):
+    '''returns the i-th element (starting at 1) of the Luby sequence 1, 1, 2, 1, 1, 2, 4, 1, ...'''
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    if i == (1 << k) - 1:
+        return 1 << (k - 1)
+    return luby(i - (1 << (k - 1)) + 1)
+
+
+def restart_cutoffs(flags):
+    '''returns the node cutoffs of the restarts specified by flags, the last run is not bounded'''
+    if flags.restarts == "luby":
+        cutoffs = [flags.restart_cutoff * luby(i) for i in range(1, flags.max_restarts + 1)]
+    elif flags.restarts == "geometric":
+        cutoffs = [int(flags.restart_cutoff * 1.5 ** i) for i in range(flags.max_restarts)]
+    else:
+        raise Synthesis_Error("unknown restart strategy %s" % str(flags.restarts))
+    return cutoffs + [None]
+
+
+def lazy_product(iterables):
+    '''generator that yields the combinations of itertools.product(*iterables) as lists, in the same order.
+    Unlike itertools.product, it only advances an iterable when a combination needs its next element and keeps the elements for later combinations'''
+    iterators = [iter(iterable) for iterable in iterables]
+    consumed = [[] for _ in iterables]
+    def available(i, n):
+        while len(consumed[i]) <= n:
+            try:
+                consumed[i].append(next(iterators[i]))
+            except StopIteration:
+                return False
+        return True
+    def combinations(i, prefix):
+        if i == len(iterators):
+            yield prefix
+            return
+        n = 0
+        while available(i, n):
+            yield from combinations(i + 1, prefix + [consumed[i][n]])
+            n += 1
+    yield from combinations(0, [])
+
+
+class Branch_Point(Exception):
+    '''raised when a probing search reaches a choice point with several State Possibilities, count is their number'''
+    def __init__(self, count):
+        self.count = count
+
+
+#topology shared with the worker processes of a parallel search (inherited when the workers are forked)
+_parallel_topology = None
+
+def _enumerate_subtree(wire_state_dict, flags, path):
+    '''worker of Topology.parallel_wire_updates, returns the update sequences of all solutions below the choices given by path'''
+    solutions = []
+    for proposed_states in _parallel_topology.generate_assignments(wire_state_dict, flags, path):
+        solution = _parallel_topology.create_update_sequence(proposed_states, flags)
+        if solution is None:
+            raise Synthesis_Error("solution is None")
+        solutions.append(solution)
+    return solutions
+
+
+def _solve_component(wire_state_dict, flags):
+    '''worker of Topology.generate_solutions, returns the encoded assignments of a single subsystem'''
+    assignments = _parallel_topology.generate_assignments(wire_state_dict, flags)
+    if not flags.all_solutions:
+        assignments = itertools.islice(assignments, 1)
+    return list(map(_parallel_topology.encode_assignment, assignments))
+
+
+_compile_platform = None
+
+def _consumer_states():
+    '''worker of compile_transitions, returns the power states of every consumer of the platform'''
+    topology = Topology(*_compile_platform)
+    return {name : sorted(topology.nodes[name].states) for name in sorted(topology.stateful_nodes)}
+
+
+def _compile_transition(initial, target, flags):
+    '''worker of compile_transitions, returns the plans of the transitions from the initial platform state to initial and from there to target,
+    and the message of the error that stopped them (None if both were solved)'''
+    topology = Topology(*_compile_platform)
+    topology.transition_table = Transition_Table()
+    try:
+        topology.stateful_node_update(initial, copy.deepcopy(flags))
+    except Synthesis_Error as e:
+        return topology.transition_table.plans, "%s is not reachable from the initial platform state: %s" % (initial, e.msg)
+    try:
+        topology.stateful_node_update(target, copy.deepcopy(flags))
+    except Synthesis_Error as e:
+        return topology.transition_table.plans, "no transition from %s to %s: %s" % (initial, target, e.msg)
+    return topology.transition_table.plans, None
+
+
+def compile_transitions(nodes, wires, flags = None, workers = 1):
+    '''solves the transitions between all combinations of consumer power states of the platform described by nodes and wires (see Topology),
+    starting from its initial state, and returns them as a Transition_Table. Infeasible transitions are left out (and logged).
+
+    Only one hop is covered: a transition from initial to target is solved from the platform state that the transition from the initial platform
+    state to initial reaches. Transitions from platform states reached in any other way (e.g. after several transitions) are not part of the table.
+
+    Every transition is solved on a new platform instance in a separate (forked) process, such that all of them start from the platform a Topology
+    constructed by the calling process would describe. workers processes are used at the same time.'''
+    global _compile_platform
+    if flags is None:
+        flags = State_Search_Flags(all_solutions = False)
+    table = Transition_Table()
+    _compile_platform = (nodes, wires)
+    try:
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+            with context.Pool(1, maxtasksperchild = 1) as pool:
+                consumer_states = pool.apply(_consumer_states)
+            combinations = [dict(zip(consumer_states, states)) for states in itertools.product(*consumer_states.values())]
+            pairs = [(initial, target, flags) for initial in combinations for target in combinations if initial != target]
+            with context.Pool(max(1, workers), maxtasksperchild = 1) as pool:
+                results = pool.starmap(_compile_transition, pairs)
+        else:
+            consumer_states = _consumer_states()
+            combinations = [dict(zip(consumer_states, states)) for states in itertools.product(*consumer_states.values())]
+            results = [_compile_transition(initial, target, flags) for initial in combinations for target in combinations if initial != target]
+    finally:
+        _compile_platform = None
+    for plans, error in results:
+        table.plans.update(plans)
+        if not error is None:
+            search_log.warning("skipping transition: %s", error)
+    return table
+
+
+_feasibility_solver = None
+#key of the problem pushed on top of the constraints of the platform in _feasibility_solver
+_feasibility_problem = None
+
+def _init_feasibility_worker(smt):
+    '''initializer of the processes of Topology.feasibility_pool, creates a solver holding the assertions smt (SMT-LIB text)'''
+    global _feasibility_solver, _feasibility_problem
+    _feasibility_solver = z3.Solver(ctx = z3.Context())
+    _feasibility_solver.from_string(smt)
+    _feasibility_problem = None
+
+
+def _check_smt(problem_key, problem, smt):
+    '''worker of Topology.check_feasibility_batch, checks if the assertions smt are satisfiable together with the preloaded constraints and
+    the assertions problem (identified by problem_key, only parsed if they differ from the ones of the last check)'''
+    global _feasibility_problem
+    if _feasibility_problem != problem_key:
+        if not _feasibility_problem is None:
+            _feasibility_solver.pop()
+        _feasibility_solver.push()
+        #parsed separately, as the solver rejects declarations of constants it already knows
+        _feasibility_solver.add(z3.parse_smt2_string(problem, ctx = _feasibility_solver.ctx))
+        _feasibility_problem = problem_key
+    _feasibility_solver.push()
+    _feasibility_solver.add(z3.parse_smt2_string(smt, ctx = _feasibility_solver.ctx))
+    success = _feasibility_solver.check() == z3.sat
+    _feasibility_solver.pop()
+    return success
+
+
+class Nogood_Database(object):
+    '''stores nogoods learnt by the state generation procedure, indexed by the conductors they restrict.
+
+    A nogood is a pair (restrictions, pending), whereby restrictions is a state dictionary and pending a set of conductors.
+    It states that no solution exists if every conductor in restrictions is restricted (decided or not) to a subset of its state in restrictions
+    and every conductor in pending is not yet decided.'''
+    def __init__(self, max_size = 10000):
+        self.max_size = max_size
+        self.clear()
+
+    def clear(self):
+        self.nogoods = []
+        self.index = {}
+        self.keys = set()
+
+    def __len__(self):
+        return len(self.nogoods)
+
+    def add(self, restrictions, pending):
+        '''records a new nogood, nothing is recorded if a restriction is unknown (None) or if the database is full'''
+        if len(self.nogoods) >= self.max_size or None in restrictions.values() or not pending <= set(restrictions):
+            return
+        key = repr(sorted(restrictions.items()))
+        if key in self.keys:
+            return
+        self.keys.add(key)
+        for wire in restrictions:
+            self.index.setdefault(wire, []).append(len(self.nogoods))
+        self.nogoods.append((copy.deepcopy(restrictions), frozenset(pending)))
+
+    def find(self, wires, wire_state_dict, proposed_states):
+        '''returns a nogood restricting any of the conductors in "wires" that holds for the given execution state, None if there is none'''
+        candidates = set()
+        for wire in wires:
+            candidates.update(self.index.get(wire, []))
+        for i in sorted(candidates):
+            restrictions, pending = self.nogoods[i]
+            holds = True
+            for wire, state in restrictions.items():
+                if wire in wire_state_dict:
+                    current = wire_state_dict[wire][WireState.State]
+                elif wire in proposed_states and not wire in pending:
+                    current = proposed_states[wire][ProposedState.State]
+                else:
+                    holds = False
+                    break
+                if not state_subset(current, state):
+                    holds = False
+                    break
+            if holds:
+                return self.nogoods[i]
+        return None
+
+
 class Synth_state(object):
     '''a class used to store previous execution states for backtracking purposes'''
-    def __init__(self, state, wire, wire_state_dict, proposed_states, synth_constraints, constrained_wires, choice = None):
+    def __init__(self, state, wire, wire_state_dict, proposed_states, synth_constraints, constrained_wires, choice = None, frontier = None):
         self.state =state
         self.wire = wire
         self.wire_state_dict = wire_state_dict
@@ -1887,6 +3607,25 @@ class Synth_state(object):
         self.synth_constraints = synth_constraints
         self.constrained_wires = constrained_wires
         self.choice = choice
+        #heap of (priority, conductor name) entries of conductors in wire_state_dict, may contain outdated entries
+        self.frontier = [] if frontier is None else frontier
+        #undecided conductors the conflicts of the current choice point rely on, used for nogood learning
+        self.conflict_pending = set()
+        self.conflict_unrecordable = False
+        #indices of the State Possibilities to take at the first choice points with several possibilities (used to split the search)
+        self.path = ()
+        self.branch_depth = 0
+        #if set, the search raises Branch_Point at the first such choice point not covered by path
+        self.probe = False
+        #one-element list holding the most conductors kept in their current state by a solution found so far, None unless searching for the fewest changes
+        self.best_keep = None
+        #conductors whose restriction no longer contains their current state
+        self.lost = set()
+        #random.Random instance used to shuffle the State Possibilities of each choice point (restarts), None keeps their order
+        self.rng = None
+        #number of processed choices, the search raises Search_Cutoff once it exceeds cutoff (if not None)
+        self.expanded = 0
+        self.cutoff = None
 
 
     def str(self):
@@ -1895,14 +3634,33 @@ class Synth_state(object):
     #creates a new Synth_state with all the currently collected information to fall back to later on
     def snapshot(self):
         '''return a new Synth_state instance that is an exact copy of self'''
-        return Synth_state(copy.deepcopy(self.state), self.wire, copy.deepcopy(self.wire_state_dict), copy.deepcopy(self.proposed_states), copy.deepcopy(self.synth_constraints), copy.deepcopy(self.constrained_wires), copy.deepcopy(self.choice))
+        snapshot = Synth_state(copy.deepcopy(self.state), self.wire, copy.deepcopy(self.wire_state_dict), copy.deepcopy(self.proposed_states), copy.deepcopy(self.synth_constraints), copy.deepcopy(self.constrained_wires), copy.deepcopy(self.choice), list(self.frontier))
+        snapshot.lost = set(self.lost)
+        return snapshot
+
+    def init_frontier(self, topology, flags):
+        '''fills the frontier with all conductors in wire_state_dict'''
+        self.frontier = [(topology.frontier_key(wire, state, flags), wire) for wire, (state, _) in self.wire_state_dict.items()]
+        heapq.heapify(self.frontier)
+
+    def push_frontier(self, wire, topology, flags):
+        '''(re)inserts the conductor "wire" into the frontier after its restriction in wire_state_dict changed'''
+        heapq.heappush(self.frontier, (topology.frontier_key(wire, self.wire_state_dict[wire][WireState.State], flags), wire))
+
+    def pop_frontier(self):
+        '''removes and returns the next conductor to decide, skips entries of conductors that were decided in the meantime'''
+        while True:
+            _, wire = heapq.heappop(self.frontier)
+            if wire in self.wire_state_dict:
+                return wire
 
     
     
     #updates the Synth_state with the choice of a wire state
-    def process_choice(self, choice, choice_index, flags):
+    def process_choice(self, choice, choice_index, flags, topology):
         '''update the synth_state instance with the requirements associated with a chosen state possibility "choice"'''
         (state, constraints, complex_constraints, dependency) = choice
+        self.expanded += 1
         choice_index = max_none(choice_index, self.wire_state_dict[self.wire.name][WireState.Index]) #remember last choice this wire was involved in
         del self.wire_state_dict[self.wire.name]
         if not self.wire.name in self.proposed_states:
@@ -1921,6 +3679,10 @@ class Synth_state(object):
                     self.synth_constraints.append((fun, (new_names)))
         fallback = {}
         success = True
+        #restrictions of undecided wires before this choice was processed (used by forward checking)
+        pending = {}
+        #restrictions of decided wires before this choice was processed
+        decided = {}
         #see if constraints of choice can be enforced
         for (wire_name, state) in constraints.items():
             #wire_name = getattr(self.wire.output_device, name).name
@@ -1937,6 +3699,10 @@ class Synth_state(object):
                 rival_state, rival_choice, rival_dependency, raw_req = self.proposed_states[wire_name]
             if not rival_state is None:
                 c = max_none(choice_index, rival_choice)
+                if not proposed:
+                    pending[wire_name] = rival_state
+                else:
+                    decided[wire_name] = rival_state
                 try:
                     if proposed:
                         self.proposed_states[wire_name] = (intersect(rival_state, state), c, rival_dependency, raw_req)
@@ -1945,13 +3711,83 @@ class Synth_state(object):
                 except State_Space_Error:
                     #print("failed because of: " + wire_name + str(rival_state))
                     success = False
+                    fallback[wire_name] = rival_state
                     if not flags.advanced_backtracking:
                         break
-                    fallback[wire_name] = rival_state
             else:
                 self.wire_state_dict[wire_name] = (copy.deepcopy(state), choice_index)
+                pending[wire_name] = None
+        if success and flags.forward_checking:
+            success = self.forward_check(pending, topology, fallback, flags)
+        if success and len(topology.nogoods) > 0:
+            success = self.check_nogoods(constraints, pending, decided, topology, fallback)
+        if success and not self.best_keep is None and not self.within_bound(itertools.chain([self.wire.name], pending, decided), topology):
+            #the branch cannot improve on the best solution, which is no conflict between restrictions
+            success = False
+            self.conflict_unrecordable = True
+        if success:
+            for wire_name, rival_state in pending.items():
+                #with a static order only newly restricted conductors need an entry
+                if rival_state is None or flags.dynamic_wire_ordering:
+                    self.push_frontier(wire_name, topology, flags)
         return (success, fallback)
 
+    def within_bound(self, touched, topology):
+        '''branch-and-bound: updates lost with the conductors in touched whose restriction no longer contains their current state.
+        Returns False if the remaining conductors cannot keep more states than the best solution found so far'''
+        for name in touched:
+            if name in topology.current_wire_state and not name in self.lost:
+                value = self.wire_state_dict[name][WireState.State] if name in self.wire_state_dict else self.proposed_states[name][ProposedState.State]
+                if not state_overlap(topology.current_wire_state[name], value):
+                    self.lost.add(name)
+        return len(topology.current_wire_state) - len(self.lost) > self.best_keep[0]
+
+    def check_nogoods(self, constraints, pending, decided, topology, fallback):
+        '''checks if the execution state after processing a choice with requirements "constraints" contains a learnt nogood.
+
+        pending and decided map the conductors restricted by the choice to their restrictions before the choice (None if they were unrestricted).
+        If a nogood holds, adds the restrictions it relies on to fallback and returns False'''
+        nogood = topology.nogoods.find(constraints.keys(), self.wire_state_dict, self.proposed_states)
+        if nogood is None:
+            return True
+        restrictions, nogood_pending = nogood
+        for wire_name in restrictions:
+            previous = pending.get(wire_name, decided.get(wire_name))
+            if not wire_name in pending and not wire_name in decided:
+                #not restricted by this choice
+                previous = self.wire_state_dict[wire_name][WireState.State] if wire_name in self.wire_state_dict else self.proposed_states[wire_name][ProposedState.State]
+            if wire_name in nogood_pending:
+                if previous is None:
+                    #only holds because the choice restricted a conductor that was still unrestricted, cannot be generalised
+                    self.conflict_unrecordable = True
+                else:
+                    self.conflict_pending.add(wire_name)
+            if not previous is None:
+                fallback[wire_name] = previous
+        return False
+
+    def forward_check(self, pending, topology, fallback, flags):
+        '''checks that every undecided conductor restricted by the last choice still has a State Possibility left.
+        
+        pending: maps the undecided conductors touched by the choice to their restriction before the choice (None if they were unrestricted)
+        
+        Adds the previous restriction of every conductor without State Possibilities to fallback, returns False if there was any such conductor'''
+        success = True
+        for wire_name, rival_state in pending.items():
+            if len(topology.wires[wire_name].possible(self.wire_state_dict[wire_name][WireState.State])) == 0:
+                success = False
+                #the conflict only holds while the conductor is undecided
+                self.conflict_pending.add(wire_name)
+                #unrestricted conductors fail regardless of earlier choices, nothing to avoid
+                if not rival_state is None:
+                    fallback[wire_name] = rival_state
+                else:
+                    #the conflict relies on the conductor being unrestricted, which nogoods cannot express
+                    self.conflict_unrecordable = True
+                if not flags.advanced_backtracking:
+                    break
+        return success
+
     def fallback_synth(self, revert):
         '''revert to the execution state stored by a synth_state snapshot'''
         self.state = copy.deepcopy(revert.state)
@@ -1961,6 +3797,8 @@ class Synth_state(object):
         self.synth_constraints = copy.deepcopy(revert.synth_constraints)
         self.constrained_wires = copy.deepcopy(revert.constrained_wires)
         self.choice = copy.deepcopy(revert.choice)
+        self.frontier = list(revert.frontier)
+        self.lost = set(revert.lost)
 
     #return -2 if key not present in wire_state_dict and proposed states
     #return -1 if key is None in either/both wire_state_dict / proposed states
@@ -2035,7 +3873,8 @@ class Synth_state(object):
     def revert(self, choices, flags, topology, avoid = None):
         '''reverts to a previous execution state, either naively if avoid = None or to an execution state where the contradicting restrictions given by "avoid" can be avoided'''
         finished = False
-        if not flags.advanced_backtracking:
+        if not flags.advanced_backtracking or not self.best_keep is None:
+            #branches pruned by the bound are no conflicts advanced backtracking could resolve
             avoid = None
         while not finished: #new choice might fail already when processed, must keep trying until it succeeds or no more choices left
             if(len(choices) == 0):
@@ -2049,7 +3888,7 @@ class Synth_state(object):
                         length = len(choices)
                         if len(revert[0]) == 0: #have used all choices we had
                             length = length - 1
-                        (finished, _) = self.process_choice(current_choice, length, flags)
+                        (finished, _) = self.process_choice(current_choice, length, flags, topology)
                         if finished:
                             break
                 else:
@@ -2074,7 +3913,7 @@ class Synth_state(object):
                             length = len(choices)
                             if len(revert[0]) == 0:
                                 length = length - 1
-                            finished, _ = self.process_choice(current_choice, length, flags)
+                            finished, _ = self.process_choice(current_choice, length, flags, topology)
                             if finished:
                                 break
                             self.fallback_synth(revert[1])
@@ -2085,7 +3924,7 @@ class Synth_state(object):
                             current_choice = already_tried_choices.pop(0)
                             worth_a_try = self.worth_a_try(avoid, current_choice, could_change, consider_conditions)
                             if worth_a_try:
-                                finished, _ = self.process_choice(current_choice, None, flags)
+                                finished, _ = self.process_choice(current_choice, None, flags, topology)
                                 self.fallback_synth(revert[1])
                                 if not finished:
                                     pass 
@@ -2102,7 +3941,9 @@ class Synth_state(object):
     def state_space_search(self, choices, topology, flags):
         '''implements a single iteration of the state generation procedure'''
         while len(self.wire_state_dict) != 0:
-            wire = min(self.wire_state_dict.keys(), key = topology.wire_sort_function) #extracts next desired state to enforce
+            if not self.cutoff is None and self.expanded > self.cutoff:
+                raise Search_Cutoff()
+            wire = self.pop_frontier() #extracts next desired state to enforce
             #self.state = self.wire_state_dict.pop(wire)
             self.state = self.wire_state_dict[wire]
             w = topology.wires[wire]
@@ -2110,7 +3951,19 @@ class Synth_state(object):
             if wire in self.proposed_states:
                 raise Synthesis_Error("erroneous state")
             else:
-                self.choice = possible(self.state[0], w.constraints)
+                self.choice = w.possible(self.state[0])
+                if not self.rng is None:
+                    self.rng.shuffle(self.choice)
+                if flags.current_state_first:
+                    self.choice = topology.order_choices(wire, self.choice)
+                forced = False
+                if len(self.choice) > 1 and self.branch_depth < len(self.path):
+                    #decided by the split of a parallel search, never revisited
+                    self.choice = [self.choice[self.path[self.branch_depth]]]
+                    self.branch_depth += 1
+                    forced = True
+                elif len(self.choice) > 1 and self.probe:
+                    raise Branch_Point(len(self.choice))
                 if(len(self.choice) == 0):
                     #print("conflict" + str(self.wire.name) + str(self.state))
                     if(len(choices) == 0):
@@ -2122,13 +3975,15 @@ class Synth_state(object):
                     fallback = self.snapshot()
                     avoid = {}
                     success = False
+                    self.conflict_pending = set()
+                    self.conflict_unrecordable = False
                     choice = copy.deepcopy(self.choice)
                     while(len(choice) > 0):
                         length = len(choices)
                         current_choice = choice.pop(0)
                         if len(choice) == 0:
                             length = length - 1
-                        success, failure_set = self.process_choice(current_choice, length, flags)
+                        success, failure_set = self.process_choice(current_choice, length, flags, topology)
                         state_union_dict(avoid, failure_set)
                         if success:
                             break
@@ -2138,6 +3993,9 @@ class Synth_state(object):
                         choices.append((choice, fallback))
                     elif not success:
                         state_union_dict(avoid, {w.name : self.state[0]})
+                        if flags.learn_nogoods and not self.conflict_unrecordable and not forced:
+                            #every State Possibility of w failed: the restrictions in avoid cannot hold while w is undecided
+                            topology.nogoods.add(avoid, self.conflict_pending | {w.name})
                         if len(choices) == 0:
                             return (None, [])
                         else:
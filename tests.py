@@ -1,11 +1,21 @@
 import unittest
 from sequence_generation import topological_sort, intersect, State_Space_Error, \
                 Topology, State_Search_Flags, Node, Stateful_Node, Input, Output, PowerState, \
-                state_difference, Wire, Constraint
-from enzian_descriptions import enzian_nodes, enzian_wires, ISPPAC
+                state_difference, Wire, Constraint, Nogood_Database, luby, possible, Synthesis_Error, \
+                Feasibility_Cache, Transition_Table, sequence_log, search_log, Event_Graph, Trace_Buffer, Timing_Analysis, \
+                register_cost, solution_costs, digest, Canonical_Error, lazy_product, compile_transitions
+from enzian_descriptions import enzian_nodes, enzian_wires, ISPPAC, MAX15301
 import itertools
 import random
 import copy
+import os
+import tempfile
+import json
+import io
+import contextlib
+import logging
+import types
+from unittest import mock
 from functools import partial
 import z3
 
@@ -57,6 +67,24 @@ class TestTopologicalSort(unittest.TestCase):
         graph = {"w1": set(), "w2": {"w1", "w3"}, "w3": {"w1", "w2"}}
         self.assertIsNone(topological_sort(graph))
 
+    def test_event_graph_union(self):
+        first = {"w1": {"set_w1"}, "set_w2": {"w1"}}
+        second = {"w1": {"set_w2"}}
+        self.assertTrue(Event_Graph.from_dict(first).is_acyclic())
+        self.assertTrue(Event_Graph.from_dict(second).is_acyclic())
+        self.assertFalse(Event_Graph.from_dict(first, second).is_acyclic())
+
+    def test_event_ids(self):
+        topology = Topology([("n0", 0x0, Node6, []), ("n1", 0x0, Node3, [])], [("w0", "n0", "O1", {("n1", "I1")})])
+        initiate, complete = topology.event_ids["set_w0"], topology.event_ids["w0"]
+        self.assertEqual((initiate % 2, complete), (0, initiate + 1))
+        graph = Event_Graph.from_dict({"w0": {"set_w0"}}, ids = topology.event_ids)
+        self.assertEqual(graph.rank_sort(), [[initiate], [complete]])
+        commands = topology.construct_command_string([["set_w0"], ["w0"]], {"w0" : [{1}]})
+        #events without ID are resolved by their name
+        topology.event_ids = {}
+        self.assertEqual(topology.construct_command_string([["set_w0"], ["w0"]], {"w0" : [{1}]}), commands)
+
 class TestIntersect(unittest.TestCase):
     def test_intersect(self):
         arguments_ok = [
@@ -87,7 +115,325 @@ class TestIntersect(unittest.TestCase):
         with self.assertRaises(State_Space_Error):
             intersect(*arguments_fail_list)
 
+
+class TestNogoodDatabase(unittest.TestCase):
+    def test_find(self):
+        nogoods = Nogood_Database()
+        nogoods.add({"w0": [{0}], "w1": [(2, 8)]}, {"w1"})
+        self.assertIsNone(nogoods.find({"w2"}, {"w0": ([{0}], None), "w1": ([(3, 4)], None)}, {}))
+        self.assertIsNotNone(nogoods.find({"w0"}, {"w0": ([{0}], None), "w1": ([(3, 4)], None)}, {}))
+        self.assertIsNotNone(nogoods.find({"w0"}, {"w1": ([(3, 4)], None)}, {"w0": ([{0}], None, None, {})}))
+        #w1 must not be decided yet
+        self.assertIsNone(nogoods.find({"w0"}, {"w0": ([{0}], None)}, {"w1": ([(3, 4)], None, None, {})}))
+        self.assertIsNone(nogoods.find({"w0"}, {"w0": ([{0, 1}], None), "w1": ([(3, 4)], None)}, {}))
     
+class TestRestarts(unittest.TestCase):
+    def test_luby(self):
+        self.assertEqual([luby(i) for i in range(1, 16)], [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8])
+
+    def test_reproducible(self):
+        enzian = Topology(enzian_nodes, enzian_wires)
+        enzian.current_node_state.update({"cpu" : "POWERED_ON", "fpga" : "POWERED_DOWN"})
+        runs = []
+        for i in range(2):
+            enzian.parametrized_state_search({}, State_Search_Flags(all_solutions = False, restarts = "luby", restart_cutoff = 20, restart_seed = 7), 1)
+            runs.append(enzian.restart_seeds)
+        self.assertGreater(len(runs[0]), 1)
+        self.assertTrue(runs[0][-1][2])
+        self.assertEqual(runs[0], runs[1])
+
+
+class TestFeasibilityCache(unittest.TestCase):
+    def test_cache(self):
+        topology = Topology([("n0", 0x0, Node6, []), ("n1", 0x0, Node3, [])], [("w0", "n0", "O1", {("n1", "I1")})])
+        dp_table = [[({"w0" : [{0}]}, ""), ({"w0" : [{1}]}, "")]]
+        results = [topology.check_feasibility((i,), dp_table) for i in range(2)]
+        self.assertEqual((topology.feasibility_cache.hits, topology.feasibility_cache.misses), (0, 2))
+        self.assertEqual([topology.check_feasibility((i,), dp_table) for i in range(2)], results)
+        self.assertEqual((topology.feasibility_cache.hits, topology.feasibility_cache.misses), (2, 2))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.json")
+            topology.feasibility_cache.save(path)
+            loaded = Feasibility_Cache()
+            loaded.load(path)
+        self.assertEqual(loaded.entries, topology.feasibility_cache.entries)
+
+    def test_shared_cache(self):
+        nodes, wires = [("n0", 0x0, Node6, []), ("n1", 0x0, Node3, [])], [("w0", "n0", "O1", {("n1", "I1")})]
+        dp_table = [[({"w0" : [{0}]}, "")]]
+        #instances use their own cache unless they are given a shared one
+        first, second = Topology(nodes, wires), Topology(nodes, wires)
+        self.assertIsNot(first.feasibility_cache, second.feasibility_cache)
+        shared = Feasibility_Cache()
+        for i in range(2):
+            topology = Topology(nodes, wires, feasibility_cache = shared)
+            topology.check_feasibility((0,), dp_table)
+        self.assertEqual((shared.hits, shared.misses), (1, 1))
+        #the fingerprint identifies the z3 constraints independently of the order of State Possibilities
+        first.wires["w0"].constraints.reverse()
+        first.generate_z3_solver()
+        self.assertEqual(first.z3_fingerprint, second.z3_fingerprint)
+        del first.wires["w0"].constraints[0]
+        first.generate_z3_solver()
+        self.assertNotEqual(first.z3_fingerprint, second.z3_fingerprint)
+
+    def test_digest_functions(self):
+        def scaled(factor):
+            return lambda x1, x2: x1 * factor == x2
+        self.assertEqual(digest(scaled(2)), digest(scaled(2)))
+        self.assertNotEqual(digest(scaled(2)), digest(scaled(3)))
+        offset = lambda x1, x2, o = 0: x1 + o == x2
+        self.assertNotEqual(digest(partial(offset, o = 1)), digest(partial(offset, o = 2)))
+        self.assertNotEqual(digest(offset), digest(lambda x1, x2, o = 1: x1 + o == x2))
+        self.assertRaises(Canonical_Error, digest, scaled(object()))
+        #feasibility checks of a platform that cannot be identified are not cached
+        topology = Topology([("n0", 0x0, Node6, []), ("n1", 0x0, Node3, [])], [("w0", "n0", "O1", {("n1", "I1")})])
+        topology.z3_fingerprint = None
+        dp_table = [[({"w0" : [{0}]}, ""), ({"w0" : [{1}]}, "")]]
+        topology.check_feasibility((0,), dp_table)
+        self.assertEqual(len(topology.feasibility_cache), 0)
+
+
+class TestTransitionTable(unittest.TestCase):
+    def test_replay(self):
+        table = Transition_Table()
+        runs = []
+        for i in range(2):
+            enzian = Topology(enzian_nodes, enzian_wires)
+            enzian.transition_table = table
+            enzian.stateful_node_update({"cpu" : "POWERED_ON"}, State_Search_Flags(all_solutions = False, no_output = True))
+            runs.append((enzian.current_wire_state, enzian.current_node_state, enzian.commands, enzian.component_attributes(), enzian.updatable_vars))
+        self.assertEqual((table.hits, table.misses), (1, 1))
+        self.assertEqual(runs[0], runs[1])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "transitions.json")
+            table.save(path)
+            loaded = Transition_Table()
+            loaded.load(path)
+        self.assertEqual(loaded.plans, table.plans)
+        enzian = Topology(enzian_nodes, enzian_wires)
+        enzian.transition_table = loaded
+        enzian.stateful_node_update({"cpu" : "POWERED_ON"}, State_Search_Flags(all_solutions = False, no_output = True))
+        self.assertEqual(loaded.hits, 1)
+        self.assertEqual((enzian.current_wire_state, enzian.current_node_state, enzian.commands, enzian.component_attributes(), enzian.updatable_vars), runs[0])
+
+    def test_stable_platform(self):
+        #constructing a platform does not change the component descriptions shared with later instances
+        fingerprints = [Topology(enzian_nodes, enzian_wires).topology_hash() for i in range(2)]
+        self.assertEqual(fingerprints[0], fingerprints[1])
+
+    def test_keys(self):
+        enzian = Topology(enzian_nodes, enzian_wires)
+        demand = {"cpu" : "POWERED_ON"}
+        key = enzian.transition_key(demand, State_Search_Flags(all_solutions = False))
+        self.assertEqual(Topology(enzian_nodes, enzian_wires).transition_key(demand, State_Search_Flags(all_solutions = False)), key)
+        self.assertEqual(enzian.transition_key(demand, State_Search_Flags(all_solutions = False, no_output = True)), key)
+        for flags in [State_Search_Flags(all_solutions = False, forward_checking = True), State_Search_Flags(all_solutions = False, restarts = "luby")]:
+            self.assertNotEqual(enzian.transition_key(demand, flags), key)
+        #the search order decides the first solution found
+        enzian.sorted_wires.reverse()
+        self.assertNotEqual(enzian.transition_key(demand, State_Search_Flags(all_solutions = False)), key)
+        enzian.sorted_wires.reverse()
+        wire = next(wire for wire in enzian.wires.values() if len(wire.constraints) > 1)
+        wire.constraints.reverse()
+        self.assertNotEqual(enzian.transition_key(demand, State_Search_Flags(all_solutions = False)), key)
+        wire.constraints.reverse()
+        self.assertEqual(enzian.transition_key(demand, State_Search_Flags(all_solutions = False)), key)
+        #State Possibilities that are not part of the z3 problem
+        wire.constraints[0] = copy.deepcopy(wire.constraints[0])
+        self.assertIsNone(enzian.transition_key(demand, State_Search_Flags(all_solutions = False)))
+
+    def test_compile_errors(self):
+        def update(topology, node_states, flags):
+            if node_states.get("fpga") == "POWERED_ON":
+                raise Synthesis_Error("unsolvable")
+        with mock.patch.object(Topology, "stateful_node_update", update), self.assertLogs(search_log, logging.WARNING) as logs:
+            table = compile_transitions(enzian_nodes, enzian_wires, workers = 4)
+        self.assertEqual(len(table), 0)
+        #transitions that fail on the way to their start state and those that fail themselves are both reported
+        messages = "\n".join(logs.output)
+        self.assertIn("is not reachable from the initial platform state: unsolvable", messages)
+        self.assertIn("no transition from", messages)
+
+    def test_versions(self):
+        enzian = Topology(enzian_nodes, enzian_wires)
+        fingerprint = enzian.topology_hash()
+        enzian.nodes["cpu"].durations = {"*" : (1.0, 1.0)}
+        self.assertNotEqual(enzian.topology_hash(), fingerprint)
+        table = Transition_Table()
+        table.add("key", {"steps" : []})
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "transitions.json")
+            table.save(path)
+            with open(path) as table_file:
+                data = json.load(table_file)
+            data["version"] = Transition_Table.version + 1
+            with open(path, "w") as table_file:
+                json.dump(data, table_file)
+            loaded = Transition_Table()
+            with self.assertLogs(search_log, logging.WARNING):
+                loaded.load(path)
+        self.assertEqual(len(loaded), 0)
+
+
+class TestLogging(unittest.TestCase):
+    def test_silent_by_default(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            enzian = Topology(enzian_nodes, enzian_wires)
+            enzian.stateful_node_update({"cpu" : "POWERED_ON"}, State_Search_Flags(all_solutions = False))
+        self.assertEqual(output.getvalue(), "")
+        self.assertNotEqual(enzian.commands, "")
+        with self.assertLogs(sequence_log, logging.INFO) as logs:
+            enzian.stateful_node_update({"cpu" : "POWERED_DOWN"}, State_Search_Flags(all_solutions = False))
+        blocks = [block.strip() for block in enzian.commands.split("#") if not block.isspace()]
+        self.assertIn(blocks[-1], "\n".join(logs.output))
+
+    def test_error_messages(self):
+        enzian = Topology(enzian_nodes, enzian_wires)
+        enzian.stateful_node_update({"cpu" : "POWERED_ON"}, State_Search_Flags(all_solutions = False, no_output = True))
+        with self.assertRaisesRegex(AttributeError, "no wire in topology with name no_such_wire"):
+            enzian.state_update(enzian.current_wire_state_range, dict(enzian.current_wire_state, no_such_wire = [(0, 0)]))
+
+
+class TestComponents(unittest.TestCase):
+    def test_max15301_configure(self):
+        enzian = Topology(enzian_nodes, enzian_wires)
+        wire = enzian.wires["vcc1v8_fpga"]
+        self.assertIsInstance(wire.output_device, MAX15301)
+        first, second = wire.set([(900, 900)]), wire.set([(1800, 1800)])
+        self.assertEqual(first.split("\n"), ["init_device('max15301_vcc1v8_fpga', False)", "power.device_write('max15301_vcc1v8_fpga', 'VOUT_COMMAND', 0.9)"])
+        self.assertEqual(second, "power.device_write('max15301_vcc1v8_fpga', 'VOUT_COMMAND', 1.8)")
+
+
+class TestTrace(unittest.TestCase):
+    def test_trace_buffer(self):
+        enzian = Topology(enzian_nodes, enzian_wires)
+        enzian.trace = Trace_Buffer(capacity = 2)
+        enzian.stateful_node_update({"cpu" : "POWERED_ON"}, State_Search_Flags(all_solutions = False, no_output = True))
+        self.assertEqual(len(enzian.trace), 2)
+        self.assertEqual({event["kind"] for event in enzian.trace.events}, {"implicit_set_events"})
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.jsonl")
+            enzian.trace = Trace_Buffer(capacity = 2, path = path)
+            enzian.stateful_node_update({"fpga" : "POWERED_ON"}, State_Search_Flags(all_solutions = False, no_output = True))
+            self.assertLess(len(enzian.trace), 2)
+            with open(path) as trace_file:
+                written = len(trace_file.readlines())
+            enzian.trace.flush()
+            with open(path) as trace_file:
+                events = [json.loads(line) for line in trace_file]
+        self.assertGreater(written, 2)
+        self.assertGreaterEqual(len(events), written)
+        self.assertTrue(all(event["kind"] == "implicit_set_events" and "resolved" in event for event in events))
+
+
+class TestTiming(unittest.TestCase):
+    def test_critical_path(self):
+        nodes = [("n6", 0x0, Node6, []), ("n4", 0x0, Node4, []), ("n5", 0x0, Node5, [])]
+        wires = [("w1", "n6", "O1", {("n4", "I1")}), ("w2", "n4", "O1", {("n5", "I1")})]
+        topology = Topology(nodes, wires)
+        topology.nodes["n6"].durations = {"*" : (1.0, 2.0)}
+        topology.nodes["n4"].durations = {"O1" : (0.5, 0.5)}
+        self.assertEqual(Node4.durations, {"*" : (0.0, 0.0)})
+        graph = {"set_w1" : set(), "w1" : {"set_w1"}, "set_w2" : set(), "w2" : {"set_w2"}}
+        timing = topology.analyse_timing([["set_w1", "set_w2"], ["w1", "w2"]], graph)
+        self.assertEqual(timing.boot_time, 3.0)
+        self.assertEqual(timing.critical_path, ["set_w1", "w1"])
+        self.assertEqual(timing.slack["set_w2"], 2.0)
+        self.assertEqual(timing.slack["w1"], 0.0)
+        self.assertEqual(timing.finish["w2"], 1.0)
+        #without graph every rank waits for the previous one
+        timing = topology.analyse_timing([["set_w1", "set_w2"], ["w1", "w2"]])
+        self.assertEqual(timing.boot_time, 3.0)
+        self.assertEqual(timing.slack["w2"], 1.5)
+
+    def test_boot_time(self):
+        enzian = Topology(enzian_nodes, enzian_wires)
+        enzian.stateful_node_update({"cpu" : "POWERED_ON"}, State_Search_Flags(all_solutions = False, no_output = True))
+        self.assertEqual(enzian.timings, [])
+        enzian.stateful_node_update({"fpga" : "POWERED_ON"}, State_Search_Flags(all_solutions = False, no_output = True, timing = True))
+        self.assertGreater(len(enzian.timings), 0)
+        self.assertAlmostEqual(enzian.boot_time(), sum(timing.boot_time for timing in enzian.timings))
+        self.assertGreater(enzian.boot_time(), 0.0)
+        for timing in enzian.timings:
+            self.assertTrue(all(slack >= -1e-9 for slack in timing.slack.values()))
+            if timing.critical_path:
+                self.assertAlmostEqual(timing.finish[timing.critical_path[-1]], timing.boot_time)
+
+
+class TestRanking(unittest.TestCase):
+    def test_rank_solutions(self):
+        nodes = [("n6", 0x0, Node6, []), ("n4", 0x0, Node4, []), ("n5", 0x0, Node5, [])]
+        wires = [("w1", "n6", "O1", {("n4", "I1")}), ("w2", "n4", "O1", {("n5", "I1")})]
+        topology = Topology(nodes, wires)
+        topology.nodes["n6"].durations = {"*" : (1.0, 2.0)}
+        topology.nodes["n4"].durations = {"*" : (0.5, 0.5)}
+        states = {"w1" : [{1}], "w2" : [{0}]}
+        solutions = [
+            (states, states, 1, [["set_w1"], ["w1"], ["set_w2"], ["w2"]], {"w1" : {"set_w1"}, "set_w2" : {"w1"}, "w2" : {"set_w2"}}),
+            (states, states, 0, [["set_w1", "set_w2"], ["w1", "w2"]], {"w1" : {"set_w1"}, "w2" : {"set_w2"}}),
+            (states, states, 0, [["set_w2"], ["w2"]], {"w2" : {"set_w2"}})
+        ]
+        self.assertEqual(topology.rank_solutions(solutions), [0])
+        self.assertEqual(topology.rank_solutions(solutions, "latency", k = 3), [2, 1, 0])
+        self.assertEqual(topology.rank_solutions(solutions, ["depth", "keep"], k = 2), [1, 2])
+        self.assertEqual(topology.rank_solutions(solutions, {"set_events" : 2, "depth" : 1}, k = 3), [2, 1, 0])
+        register_cost("w1_last", lambda topology, solution, commands: -len(solution[3]))
+        try:
+            self.assertEqual(topology.rank_solutions(solutions, "w1_last"), [0])
+        finally:
+            del solution_costs["w1_last"]
+        self.assertRaises(Synthesis_Error, topology.rank_solutions, solutions, "unknown")
+
+    def test_fastest(self):
+        enzian = Topology(enzian_nodes, enzian_wires)
+        enzian.stateful_node_update({"cpu" : "POWERED_ON"}, State_Search_Flags(all_solutions = False, no_output = True, ranking = ["bus_transactions", "latency"]))
+        self.assertNotEqual(enzian.commands, "")
+
+    def test_candidate_commands(self):
+        #ranking by emitted commands must not change components, also not their objects that are no plain data
+        enzian = Topology(enzian_nodes, enzian_wires)
+        node = enzian.nodes["IC12"]
+        node.session = types.SimpleNamespace(writes = 0)
+        configure = MAX15301.configure
+        def counting_configure(self):
+            self.session.writes += 1
+            return configure(self)
+        states = {"vcc1v8_fpga" : [(900, 900)]}
+        solutions = [(states, states, 0, [["set_vcc1v8_fpga"]]), (states, states, 0, [["set_vcc1v8_fpga"], []])]
+        unrelated = enzian.nodes["IC10"].current
+        with mock.patch.object(MAX15301, "configure", counting_configure):
+            self.assertEqual(enzian.rank_solutions(solutions, "bus_transactions"), [0])
+        #only the components of the conductors of a candidate's events are copied and restored
+        self.assertIs(enzian.nodes["IC10"].current, unrelated)
+        self.assertEqual(node.session.writes, 0)
+        self.assertFalse(node.configured)
+        self.assertIs(node.V_OUT, enzian.wires["vcc1v8_fpga"])
+
+
+class TestConcurrentEmission(unittest.TestCase):
+    def test_concurrent_blocks(self):
+        runs = []
+        for concurrent in [False, True]:
+            enzian = Topology(enzian_nodes, enzian_wires)
+            enzian.stateful_node_update({"cpu" : "POWERED_ON"}, State_Search_Flags(all_solutions = False, no_output = True, concurrent_emission = concurrent))
+            runs.append(enzian.commands)
+        self.assertNotIn("run_concurrently(", runs[0])
+        self.assertIn("run_concurrently(", runs[1])
+        commands = [line[len("    lambda: "):-1] if line.startswith("    lambda: ") else line for line in runs[1].split("\n") if line not in ("run_concurrently(", ")")]
+        self.assertEqual(sorted(commands), sorted(runs[0].split("\n")))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sequence.py")
+            enzian.done(path)
+            with open(path) as sequence_file:
+                sequence = sequence_file.read()
+        self.assertTrue(sequence.startswith("from concurrent.futures import ThreadPoolExecutor"))
+        compile(sequence, path, "exec")
+        #"#" lines separate ranks, the preamble adds none
+        self.assertEqual(sequence.split("\n").count("#"), enzian.commands.split("\n").count("#"))
+
+
 class Z3_Test(unittest.TestCase):
     
     def test_recover_solution(self):
@@ -216,6 +562,331 @@ class TestParametrizedStateSearch(unittest.TestCase):
             print(len(solutions))
             self.assertEqual(len(solutions), correct_number_of_solutions)
 
+    def test_forward_checking(self):
+        node_list = [
+            ("n0", 0x0, Node6, []),
+            ("n1", 0x0, Node3, []),
+            ("n2", 0x0, Node4, []),
+            ("n3", 0x0, Node5, []),
+            ("n6", 0x0, Node4, []),
+            ("n5", 0x0, Node5, [])
+        ]
+        wire_list = [
+            ("w0", "n0", "O1", {("n1", "I1")}),
+            ("w1", "n1", "O1", {("n2", "I1")}),
+            ("w2", "n1", "O2", {("n3", "I1")}),
+            ("w4", "n2", "O1", {("n6", "I1")}),
+            ("w5", "n6", "O1", {("n5", "I1")})
+        ]
+        topology = Topology(node_list, wire_list)
+        for wire_order in [["w5", "w4", "w2", "w1", "w0"], ["w0", "w1", "w2", "w4", "w5"]]:
+            topology.sorted_wires = wire_order
+            for backtracking in [False, True]:
+                with_fc = topology.parametrized_state_search({"w5": [{1}]}, State_Search_Flags(all_solutions = True, advanced_backtracking = backtracking, forward_checking = True))
+                without_fc = topology.parametrized_state_search({"w5": [{1}]}, State_Search_Flags(all_solutions = True, advanced_backtracking = backtracking, forward_checking = False))
+                self.assertEqual(len(with_fc), 1)
+                self.assertEqual(len(without_fc), 1)
+                self.assertEqual(with_fc[0][0], without_fc[0][0])
+
+    def test_nogoods_forward_checking(self):
+        #the first State Possibility of s1/s2 restricts v to a state it cannot take, forward checking prunes it
+        node_list = [
+            ("r", 0x0, Rail, []),
+            ("s1", 0x0, Switch, []),
+            ("s2", 0x0, Switch, []),
+            ("c1", 0x0, Node5, []),
+            ("c2", 0x0, Node5, [])
+        ]
+        wire_list = [
+            ("v", "r", "O1", {("s1", "V_IN"), ("s2", "V_IN")}),
+            ("e1", "s1", "O1", {("c1", "I1")}),
+            ("e2", "s2", "O1", {("c2", "I1")})
+        ]
+        topology = Topology(node_list, wire_list)
+        for wire_order in itertools.permutations(["v", "e1", "e2"]):
+            for demands in [{"e1": [{1}]}, {"e1": [{1}], "e2": [{1}]}, {}]:
+                topology.sorted_wires = list(wire_order)
+                counts = []
+                for learn_nogoods in [True, False]:
+                    topology.nogoods.clear()
+                    solutions = topology.parametrized_state_search(copy.deepcopy(demands), State_Search_Flags(all_solutions = True, forward_checking = True, learn_nogoods = learn_nogoods))
+                    counts.append(len(solutions))
+                self.assertEqual(counts[0], counts[1])
+
+    def test_dynamic_wire_ordering(self):
+        node_list = [
+            ("n0", 0x0, Node6, []),
+            ("n1", 0x0, Node3, []),
+            ("n2", 0x0, Node4, []),
+            ("n3", 0x0, Node5, []),
+            ("n4", 0x0, Node5, []),
+            ("n5", 0x0, Node5, []),
+            ("n6", 0x0, Node4, []),
+            ("n7", 0x0, Node6, []), 
+            ("n8", 0x0, Node5, [])
+        ]
+        wire_list = [
+            ("w0", "n0", "O1", {("n1", "I1")}),
+            ("w1", "n1", "O1", {("n2", "I1")}),
+            ("w2", "n1", "O2", {("n3", "I1")}),
+            ("w3", "n1", "O3", {("n4", "I1")}),
+            ("w4", "n2", "O1", {("n6", "I1")}),
+            ("w5", "n6", "O1", {("n5", "I1")}),
+            ("w6", "n7", "O1", {("n8", "I1")})
+        ]
+        topology = Topology(node_list, wire_list)
+        expected = len(topology.parametrized_state_search({}, State_Search_Flags(all_solutions = True, advanced_backtracking = False)))
+        for i in range(20):
+            random.shuffle(topology.sorted_wires)
+            solutions = topology.parametrized_state_search({}, State_Search_Flags(all_solutions = True, dynamic_wire_ordering = True))
+            self.assertEqual(len(solutions), expected)
+
+    def test_iter_solutions(self):
+        node_list = [
+            ("n0", 0x0, Node6, []),
+            ("n1", 0x0, Node3, []),
+            ("n2", 0x0, Node4, []),
+            ("n3", 0x0, Node5, []),
+            ("n7", 0x0, Node6, []), 
+            ("n8", 0x0, Node5, [])
+        ]
+        wire_list = [
+            ("w0", "n0", "O1", {("n1", "I1")}),
+            ("w1", "n1", "O1", {("n2", "I1")}),
+            ("w2", "n1", "O2", {("n3", "I1")}),
+            ("w6", "n7", "O1", {("n8", "I1")})
+        ]
+        topology = Topology(node_list, wire_list)
+        flags = State_Search_Flags(all_solutions = True)
+        solutions = topology.parametrized_state_search({}, flags)
+        assignments = list(topology.iter_solutions({}, flags))
+        self.assertEqual(len(assignments), len(solutions))
+        self.assertEqual([topology.create_update_sequence(a, flags)[0] for a in assignments], [s[0] for s in solutions])
+        first = list(itertools.islice(topology.iter_solutions({}, flags), 2))
+        self.assertEqual([a["w0"][0] for a in first], [a["w0"][0] for a in assignments[:2]])
+        #the caller's flags are not changed by the search
+        flags = State_Search_Flags(all_solutions = False)
+        next(topology.iter_solutions({}, flags))
+        self.assertTrue(flags.aggressive)
+
+    def test_parallel_all_solutions(self):
+        node_list = [
+            ("n0", 0x0, Node6, []),
+            ("n1", 0x0, Node3, []),
+            ("n2", 0x0, Node4, []),
+            ("n3", 0x0, Node5, []),
+            ("n7", 0x0, Node6, []), 
+            ("n8", 0x0, Node5, []),
+            ("n9", 0x0, Node6, []), 
+            ("n10", 0x0, Node5, [])
+        ]
+        wire_list = [
+            ("w0", "n0", "O1", {("n1", "I1")}),
+            ("w1", "n1", "O1", {("n2", "I1")}),
+            ("w2", "n1", "O2", {("n3", "I1")}),
+            ("w6", "n7", "O1", {("n8", "I1")}),
+            ("w7", "n9", "O1", {("n10", "I1")})
+        ]
+        topology = Topology(node_list, wire_list)
+        expected = topology.parametrized_state_search({}, State_Search_Flags(all_solutions = True))
+        solutions = topology.parametrized_state_search({}, State_Search_Flags(all_solutions = True, parallel_workers = 2, split_depth = 2))
+        self.assertEqual(len(solutions), len(expected))
+        self.assertTrue(compare_unordered_lists([s[0] for s in solutions], [s[0] for s in expected]))
+
+    def test_decompose_components(self):
+        node_list = [
+            ("n0", 0x0, Node6, []),
+            ("n1", 0x0, Node3, []),
+            ("n2", 0x0, Node4, []),
+            ("n3", 0x0, Node5, []),
+            ("n7", 0x0, Node6, []), 
+            ("n8", 0x0, Node5, []),
+            ("n9", 0x0, Node6, []), 
+            ("n10", 0x0, Node5, [])
+        ]
+        wire_list = [
+            ("w0", "n0", "O1", {("n1", "I1")}),
+            ("w1", "n1", "O1", {("n2", "I1")}),
+            ("w2", "n1", "O2", {("n3", "I1")}),
+            ("w6", "n7", "O1", {("n8", "I1")}),
+            ("w7", "n9", "O1", {("n10", "I1")})
+        ]
+        topology = Topology(node_list, wire_list)
+        self.assertEqual(list(map(set, topology.split_components(topology.most_general_state))), [{"w0", "w1", "w2"}, {"w6"}, {"w7"}])
+        expected = topology.parametrized_state_search({}, State_Search_Flags(all_solutions = True))
+        for workers in [0, 2]:
+            solutions = topology.parametrized_state_search({}, State_Search_Flags(all_solutions = True, decompose_components = True, parallel_workers = workers))
+            self.assertTrue(compare_unordered_lists([s[0] for s in solutions], [s[0] for s in expected]))
+
+    def test_lazy_product(self):
+        for iterables in [[[1, 2], [3], [4, 5, 6]], [[1, 2], []], [[]], []]:
+            self.assertEqual(list(lazy_product(iterables)), list(map(list, itertools.product(*iterables))))
+        def first_only():
+            yield 1
+            raise AssertionError("advanced too far")
+        combinations = lazy_product([first_only(), iter([2, 3])])
+        self.assertEqual([next(combinations), next(combinations)], [[1, 2], [1, 3]])
+        self.assertRaises(AssertionError, next, combinations)
+
+    def test_count_solutions(self):
+        node_list = [
+            ("n0", 0x0, Node6, []),
+            ("n1", 0x0, Node3, []),
+            ("n2", 0x0, Node4, []),
+            ("n3", 0x0, Node5, []),
+            ("n7", 0x0, Node6, []), 
+            ("n8", 0x0, Node5, [])
+        ]
+        wire_list = [
+            ("w0", "n0", "O1", {("n1", "I1")}),
+            ("w1", "n1", "O1", {("n2", "I1")}),
+            ("w2", "n1", "O2", {("n3", "I1")}),
+            ("w6", "n7", "O1", {("n8", "I1")})
+        ]
+        topology = Topology(node_list, wire_list)
+        flags = State_Search_Flags(all_solutions = True)
+        self.assertEqual(topology.count_solutions({}, flags), len(topology.parametrized_state_search({}, flags)))
+        self.assertEqual(topology.count_solutions({"w1" : [{0}]}, flags), len(topology.parametrized_state_search({"w1" : [{0}]}, flags)))
+
+    def test_count_shared_range(self):
+        #e1 and e2 narrow the decided range conductor v, to disjoint intervals if s1 takes its low input range
+        node_list = [
+            ("r", 0x0, WideRail, []),
+            ("s1", 0x0, Switch, []),
+            ("s2", 0x0, HighSwitch, []),
+            ("c1", 0x0, Node5, []),
+            ("c2", 0x0, Node5, [])
+        ]
+        wire_list = [
+            ("v", "r", "O1", {("s1", "V_IN"), ("s2", "V_IN")}),
+            ("e1", "s1", "O1", {("c1", "I1")}),
+            ("e2", "s2", "O1", {("c2", "I1")})
+        ]
+        topology = Topology(node_list, wire_list)
+        self.assertEqual(topology.count_residual({"e1": [{1}], "e2": [{1}]}, {"v": [(0, 5000)]}, [], {}), 1)
+        flags = State_Search_Flags(all_solutions = True)
+        for wire_order in itertools.permutations(["v", "e1", "e2"]):
+            topology.sorted_wires = list(wire_order)
+            topology.update_wire_ranks()
+            demands = {"e1": [{1}], "e2": [{1}]}
+            self.assertEqual(topology.count_solutions(copy.deepcopy(demands), flags), len(topology.parametrized_state_search(copy.deepcopy(demands), flags)))
+
+    def test_incremental(self):
+        states = []
+        for incremental in [False, True]:
+            enzian = Topology(enzian_nodes, enzian_wires)
+            enzian.stateful_node_update({"cpu" : "POWERED_ON", "fpga" : "POWERED_ON"}, State_Search_Flags(all_solutions = False, no_output = True, incremental = incremental))
+            states.append((enzian.current_wire_state, enzian.current_node_state, sorted(enzian.commands.split("\n"))))
+        self.assertEqual(states[0], states[1])
+
+    def test_feasibility_workers(self):
+        states = []
+        for workers in [0, 2]:
+            with Topology(enzian_nodes, enzian_wires) as enzian:
+                flags = State_Search_Flags(all_solutions = False, no_output = True, feasibility_workers = workers)
+                enzian.stateful_node_update({"cpu" : "POWERED_ON"}, flags)
+                executor = enzian.feasibility_executor
+                enzian.stateful_node_update({"fpga" : "POWERED_ON"}, flags)
+                states.append((enzian.current_wire_state, enzian.current_node_state, sorted(enzian.commands.split("\n"))))
+                if workers > 1:
+                    #the pool is started once and reused by the second transition
+                    self.assertIsNotNone(executor)
+                    self.assertIs(enzian.feasibility_executor, executor)
+                    self.assertGreater(enzian.feasibility_cache.misses, 0)
+                    #its workers hold the constraints of the platform, new constraints require a new pool
+                    enzian.generate_z3_solver()
+                    self.assertIsNone(enzian.feasibility_executor)
+                    enzian.feasibility_pool(workers)
+                else:
+                    self.assertIsNone(executor)
+            self.assertIsNone(enzian.feasibility_executor)
+        self.assertEqual(states[0], states[1])
+
+    def test_minimize_changes(self):
+        enzian = Topology(enzian_nodes, enzian_wires)
+        enzian.stateful_node_update({"cpu" : "POWERED_ON"}, State_Search_Flags(all_solutions = False, no_output = True))
+        demands = {"vdd_ddrcpu13" : [(1500, 1500)], "vdd_ddrcpu24" : [(1500, 1500)]}
+        solutions = enzian.parametrized_state_search(copy.deepcopy(demands), State_Search_Flags(all_solutions = True))
+        minimal = enzian.parametrized_state_search(copy.deepcopy(demands), State_Search_Flags(all_solutions = True, minimize_changes = True))
+        self.assertEqual(len(minimal), 1)
+        self.assertEqual(minimal[0][:3], max(solutions, key = lambda x: x[2])[:3])
+
+    def test_current_state_first(self):
+        enzian = Topology(enzian_nodes, enzian_wires)
+        enzian.stateful_node_update({"cpu" : "POWERED_ON"}, State_Search_Flags(all_solutions = False, no_output = True))
+        demands = {"vdd_ddrcpu13" : [(1500, 1500)], "vdd_ddrcpu24" : [(1500, 1500)]}
+        best = max(enzian.parametrized_state_search(copy.deepcopy(demands), State_Search_Flags(all_solutions = True)), key = lambda x: x[2])[2]
+        random.seed(3)
+        for i in range(3):
+            for wire in enzian.wires.values():
+                random.shuffle(wire.constraints)
+            solution = enzian.parametrized_state_search(copy.deepcopy(demands), State_Search_Flags(all_solutions = False, current_state_first = True))
+            self.assertEqual(solution[0][2], best)
+
+    def test_possible_memo(self):
+        topology = Topology([("n0", 0x0, Node6, []), ("n1", 0x0, Node3, [])], [("w0", "n0", "O1", {("n1", "I1")})])
+        wire = topology.wires["w0"]
+        for state in [wire.most_general_state, [{1}], [{1}]]:
+            self.assertEqual(wire.possible(state), possible(state, wire.constraints))
+        wire.constraints.reverse()
+        self.assertEqual(wire.possible(wire.most_general_state), possible(wire.most_general_state, wire.constraints))
+
+    def test_determine_reachable(self):
+        topology = Topology([("n0", 0x0, Node6, []), ("n1", 0x0, Node3, [])], [("w0", "n0", "O1", {("n1", "I1")})])
+        topology.check_feasibility = lambda index, dp_table: index != (1, 1)
+        dp_table = [[({}, "")] * 3, [({}, "")] * 3]
+        self.assertEqual(topology.extract_solution(*topology.determine_reachable(dp_table, True)), [(0, 0), (0, 1), (1, 2), (2, 2)])
+        self.assertEqual(topology.extract_solution(*topology.determine_reachable(dp_table, False)), [(0, 0), (1, 0), (2, 0), (2, 1), (2, 2)])
+        topology.check_feasibility = lambda index, dp_table: index[0] != 1
+        self.assertRaises(Synthesis_Error, topology.determine_reachable, dp_table, True)
+        self.assertRaises(Synthesis_Error, topology.astar_interleaving, dp_table, True)
+
+    def test_astar_interleaving(self):
+        topology = Topology([("n0", 0x0, Node6, []), ("n1", 0x0, Node3, [])], [("w0", "n0", "O1", {("n1", "I1")})])
+        checked = []
+        def check_feasibility(index, dp_table):
+            checked.append(index)
+            return index != (1, 1)
+        topology.check_feasibility = check_feasibility
+        dp_table = [[({}, "")] * 3, [({}, "")] * 3]
+        for prefer_concurrent, length in [(True, 4), (False, 5)]:
+            checked.clear()
+            sequence = topology.astar_interleaving(dp_table, prefer_concurrent)
+            self.assertEqual(len(sequence), length)
+            self.assertEqual((sequence[0], sequence[-1]), ((0, 0), (2, 2)))
+            self.assertNotIn((1, 1), sequence)
+            self.assertLess(len(checked), 9)
+
+    def test_bmc_interleaving(self):
+        topology = Topology([("n0", 0x0, Node6, []), ("n1", 0x0, Node3, [])], [("w0", "n0", "O1", {("n1", "I1")})])
+        #the entry (1, 1) demands w0 to be 0 and 1 at the same time
+        dp_table = [[({"w0" : [{0, 1}]}, ""), ({"w0" : [{0}]}, ""), ({"w0" : [{0, 1}]}, "")], [({"w0" : [{0, 1}]}, ""), ({"w0" : [{1}]}, ""), ({"w0" : [{0, 1}]}, "")]]
+        for prefer_concurrent, length in [(True, 4), (False, 5)]:
+            sequence = topology.bmc_interleaving(dp_table, prefer_concurrent)
+            self.assertEqual(len(sequence), length)
+            self.assertEqual((sequence[0], sequence[-1]), ((0, 0), (2, 2)))
+            self.assertNotIn((1, 1), sequence)
+            for previous, current in zip(sequence, sequence[1:]):
+                self.assertIn(tuple(c - p for c, p in zip(current, previous)), set(itertools.product([0, 1], repeat = 2)) - {(0, 0)})
+        #every path visits an entry (1, j) before the last one
+        dp_table[1] = [({"w0" : [{1}]}, "")] * 3
+        self.assertRaises(Synthesis_Error, topology.bmc_interleaving, dp_table, True)
+
+    def test_greedy_interleaving(self):
+        topology = Topology([("n0", 0x0, Node6, []), ("n1", 0x0, Node3, [])], [("w0", "n0", "O1", {("n1", "I1")})])
+        dp_table = [[({"w0" : [{0, 1}]}, ""), ({"w0" : [{0}]}, ""), ({"w0" : [{0, 1}]}, "")], [({"w0" : [{0, 1}]}, ""), ({"w0" : [{1}]}, ""), ({"w0" : [{0, 1}]}, "")]]
+        for prefer_concurrent in [True, False]:
+            sequence = topology.greedy_interleaving(dp_table, prefer_concurrent)
+            self.assertEqual((sequence[0], sequence[-1]), ((0, 0), (2, 2)))
+            self.assertNotIn((1, 1), sequence)
+            self.assertFalse(topology.last_interleaving_complete)
+        #both consumers have to advance at the same time
+        dp_table = [[({"w0" : [{0}]}, ""), ({"w0" : [{1}]}, ""), ({"w0" : [{0, 1}]}, "")], [({"w0" : [{0}]}, ""), ({"w0" : [{1}]}, ""), ({"w0" : [{0, 1}]}, "")]]
+        self.assertEqual(topology.greedy_interleaving(dp_table, False)[:2], [(0, 0), (1, 1)])
+        dp_table[1] = [({"w0" : [{1}]}, "")] * 3
+        self.assertRaises(Synthesis_Error, topology.greedy_interleaving, dp_table, True)
+        self.assertTrue(topology.last_interleaving_complete)
+
     def test_independence_of_sequence_2(self):        
         enzian = Topology(enzian_nodes, enzian_wires)
         enzian.current_node_state.update({"cpu" : "POWERED_ON", "fpga" : "POWERED_DOWN"})
@@ -316,6 +987,44 @@ class PowerSupply(Node):
 
 
 
+class Rail(Node):
+    O1 = Output([(0, 5000)], [
+        Constraint([(0, 0)], {}, partial(Constraint.explicit, "O1", set(), set())),
+        Constraint([(3000, 3300)], {}, partial(Constraint.explicit, "O1", set(), set()))
+    ], "power", Wire.gpio_set)
+
+    def __init__(self, name, bus_addr):
+        super(Rail, self).__init__(name, bus_addr, Rail)
+
+class WideRail(Node):
+    O1 = Output([(0, 5000)], [Constraint([(0, 5000)], {}, partial(Constraint.explicit, "O1", set(), set()))], "power", Wire.gpio_set)
+
+    def __init__(self, name, bus_addr):
+        super(WideRail, self).__init__(name, bus_addr, WideRail)
+
+class Switch(Node):
+    device = "switch"
+    V_IN = Input([(0, 5000)], "power")
+    O1 = Output([{0, 1}], [
+        Constraint([{1}], {"V_IN" : [(100, 500)]}, partial(Constraint.explicit, "O1", {"V_IN"}, set())),
+        Constraint([{1}], {"V_IN" : [(3000, 3300)]}, partial(Constraint.explicit, "O1", {"V_IN"}, set())),
+        Constraint([{0}], {"V_IN" : [(0, 5000)]}, partial(Constraint.explicit, "O1", {"V_IN"}, set()))
+    ], "logical", Wire.pin_set)
+
+    def __init__(self, name, bus_addr):
+        super(Switch, self).__init__(name, bus_addr, Switch)
+
+class HighSwitch(Node):
+    device = "high_switch"
+    V_IN = Input([(0, 5000)], "power")
+    O1 = Output([{0, 1}], [
+        Constraint([{1}], {"V_IN" : [(3000, 3300)]}, partial(Constraint.explicit, "O1", {"V_IN"}, set())),
+        Constraint([{0}], {"V_IN" : [(0, 5000)]}, partial(Constraint.explicit, "O1", {"V_IN"}, set()))
+    ], "logical", Wire.pin_set)
+
+    def __init__(self, name, bus_addr):
+        super(HighSwitch, self).__init__(name, bus_addr, HighSwitch)
+
 class Node3(Node):
     device = "node3"
     I1 = Input([{0, 1}], "logical")